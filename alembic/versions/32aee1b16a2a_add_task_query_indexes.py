@@ -0,0 +1,39 @@
+"""Add task query indexes
+
+Revision ID: 32aee1b16a2a
+Revises: 1f908a4d3c5f
+Create Date: 2026-10-18 09:12:41.503128
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '32aee1b16a2a'
+down_revision = '1f908a4d3c5f'
+branch_labels = None
+depends_on = None
+
+
+# Indexes are built CONCURRENTLY on PostgreSQL so the migration does not lock
+# writes on a live tasks table; that has to run outside a transaction.
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_user_id_id', 'tasks', ['user_id', 'id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_tasks_status_id', 'tasks', ['status', 'id'], unique=False, postgresql_concurrently=True)
+        if is_postgresql:
+            op.create_index('ix_tasks_open_user_id_id', 'tasks', ['user_id', 'id'], unique=False, postgresql_where=sa.text("status <> 'completed'"), postgresql_concurrently=True)
+        # Redundant with the primary key
+        op.drop_index('ix_tasks_id', table_name='tasks', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_id', 'tasks', ['id'], unique=False, postgresql_concurrently=True)
+        if is_postgresql:
+            op.drop_index('ix_tasks_open_user_id_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_status_id', table_name='tasks', postgresql_concurrently=True)
+        op.drop_index('ix_tasks_user_id_id', table_name='tasks', postgresql_concurrently=True)
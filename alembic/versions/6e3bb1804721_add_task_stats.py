@@ -0,0 +1,143 @@
+"""Add task stats
+
+Revision ID: 6e3bb1804721
+Revises: a581f345bda3
+Create Date: 2026-10-18 12:37:05.814276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6e3bb1804721'
+down_revision = 'a581f345bda3'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    '''
+    CREATE TRIGGER task_stats_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO task_stats (user_id, status, count)
+        VALUES (NEW.user_id, NEW.status, 1)
+        ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER task_stats_delete AFTER DELETE ON tasks
+    BEGIN
+        UPDATE task_stats SET count = count - 1
+        WHERE user_id = OLD.user_id AND status = OLD.status;
+    END
+    ''',
+    '''
+    CREATE TRIGGER task_stats_update AFTER UPDATE OF user_id, status ON tasks
+    WHEN OLD.user_id IS NOT NEW.user_id OR OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE task_stats SET count = count - 1
+        WHERE user_id = OLD.user_id AND status = OLD.status;
+        INSERT INTO task_stats (user_id, status, count)
+        VALUES (NEW.user_id, NEW.status, 1)
+        ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+    END
+    ''',
+]
+
+POSTGRESQL_TRIGGERS = [
+    '''
+    CREATE OR REPLACE FUNCTION task_stats_add() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO task_stats (user_id, status, count)
+        SELECT user_id, status, count(*) FROM new_rows GROUP BY user_id, status
+        ON CONFLICT (user_id, status)
+        DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+        RETURN NULL;
+    END $$
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION task_stats_remove() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE task_stats SET count = task_stats.count - removed.count
+        FROM (
+            SELECT user_id, status, count(*) AS count
+            FROM old_rows GROUP BY user_id, status
+        ) AS removed
+        WHERE task_stats.user_id = removed.user_id
+            AND task_stats.status = removed.status;
+        RETURN NULL;
+    END $$
+    ''',
+    '''
+    CREATE OR REPLACE FUNCTION task_stats_move() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE task_stats SET count = task_stats.count - moved.count
+        FROM (
+            SELECT old_rows.user_id, old_rows.status, count(*) AS count
+            FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+            WHERE (old_rows.user_id, old_rows.status)
+                IS DISTINCT FROM (new_rows.user_id, new_rows.status)
+            GROUP BY old_rows.user_id, old_rows.status
+        ) AS moved
+        WHERE task_stats.user_id = moved.user_id
+            AND task_stats.status = moved.status;
+        INSERT INTO task_stats (user_id, status, count)
+        SELECT new_rows.user_id, new_rows.status, count(*)
+        FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+        WHERE (old_rows.user_id, old_rows.status)
+            IS DISTINCT FROM (new_rows.user_id, new_rows.status)
+        GROUP BY new_rows.user_id, new_rows.status
+        ON CONFLICT (user_id, status)
+        DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+        RETURN NULL;
+    END $$
+    ''',
+    '''
+    CREATE TRIGGER task_stats_insert AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_stats_add()
+    ''',
+    '''
+    CREATE TRIGGER task_stats_delete AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_stats_remove()
+    ''',
+    '''
+    CREATE TRIGGER task_stats_update AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION task_stats_move()
+    ''',
+]
+
+
+# Counters are filled from the existing tasks after the triggers are in place;
+# on PostgreSQL task writes are blocked until the migration commits so none
+# fall between the two.
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    op.create_table('task_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('status', postgresql.ENUM('new', 'in_progress', 'completed', name='taskstatusenum', create_type=False), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'status')
+    )
+    if is_postgresql:
+        op.execute('LOCK TABLE tasks IN SHARE MODE')
+    for statement in POSTGRESQL_TRIGGERS if is_postgresql else SQLITE_TRIGGERS:
+        op.execute(statement)
+    op.execute(
+        'INSERT INTO task_stats (user_id, status, count) '
+        'SELECT user_id, status, count(*) FROM tasks GROUP BY user_id, status'
+    )
+
+
+def downgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    for trigger in ('task_stats_insert', 'task_stats_delete', 'task_stats_update'):
+        op.execute(f'DROP TRIGGER {trigger} ON tasks' if is_postgresql else f'DROP TRIGGER {trigger}')
+    if is_postgresql:
+        op.execute('DROP FUNCTION task_stats_add(), task_stats_remove(), task_stats_move()')
+    op.drop_table('task_stats')
@@ -0,0 +1,47 @@
+"""Add task timestamps and tombstones
+
+Revision ID: a581f345bda3
+Revises: 32aee1b16a2a
+Create Date: 2026-10-18 11:04:19.227415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a581f345bda3'
+down_revision = '32aee1b16a2a'
+branch_labels = None
+depends_on = None
+
+
+# Existing tasks get the migration time as created_at/updated_at. SQLite cannot
+# add a column with a non-constant default, so there the table is rebuilt; on
+# PostgreSQL now() is stable, so adding the columns does not rewrite the table.
+def upgrade() -> None:
+    is_postgresql = op.get_context().dialect.name == 'postgresql'
+    with op.batch_alter_table('tasks', recreate='auto' if is_postgresql else 'always') as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    op.create_table('task_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_tombstones_user_id_deleted_at_id', 'task_tombstones', ['user_id', 'deleted_at', 'id'], unique=False)
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_user_id_updated_at_id', 'tasks', ['user_id', 'updated_at', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_user_id_updated_at_id', table_name='tasks', postgresql_concurrently=True)
+    op.drop_index('ix_task_tombstones_user_id_deleted_at_id', table_name='task_tombstones')
+    op.drop_table('task_tombstones')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('created_at')
@@ -0,0 +1,80 @@
+"""Add task search
+
+Revision ID: c3f1d2a9b7e4
+Revises: 6e3bb1804721
+Create Date: 2026-10-18 14:12:40.518903
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1d2a9b7e4'
+down_revision = '6e3bb1804721'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_STATEMENTS = [
+    '''
+    CREATE VIRTUAL TABLE tasks_fts USING fts5(
+        user_id, title, description, content='tasks', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    ''',
+    '''
+    CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (rowid, user_id, title, description)
+        VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+        VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+    END
+    ''',
+    '''
+    CREATE TRIGGER tasks_fts_update AFTER UPDATE OF user_id, title, description ON tasks
+    BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+        VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+        INSERT INTO tasks_fts (rowid, user_id, title, description)
+        VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+    END
+    ''',
+    # Index the existing tasks
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+]
+
+
+# On PostgreSQL adding the stored generated column rewrites the tasks table
+# under an exclusive lock; the GIN index is then built without blocking writes.
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        for statement in SQLITE_STATEMENTS:
+            op.execute(statement)
+        return
+    op.execute(
+        '''
+        ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        '''
+    )
+    with op.get_context().autocommit_block():
+        op.create_index('ix_tasks_search_vector', 'tasks', ['search_vector'], unique=False, postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        for trigger in ('tasks_fts_insert', 'tasks_fts_delete', 'tasks_fts_update'):
+            op.execute(f'DROP TRIGGER {trigger}')
+        op.execute('DROP TABLE tasks_fts')
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tasks_search_vector', table_name='tasks', postgresql_concurrently=True)
+    op.drop_column('tasks', 'search_vector')
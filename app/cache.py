@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+# Cached task read responses (0 disables the cache; ETags are sent regardless)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "0"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+
+# Interface for cache storage. Values must be JSON-serializable so the
+# in-process backend can be swapped for a shared one (e.g. Redis) across workers.
+class CacheBackend:
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+# In-process cache with LRU eviction past `maxsize` and per-entry TTL, timed
+# by `clock`
+class LRUCache(CacheBackend):
+    def __init__(self, maxsize: int, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache of authenticated principals keyed by access token. Each entry records
+# the user's cache generation; invalidate_user() bumps it so every cached
+# token for that user misses on the next lookup.
+class PrincipalCache:
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return "principal:" + hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _user_key(username: str) -> str:
+        return f"principal-generation:{username}"
+
+    async def get(self, token: str) -> Optional[dict]:
+        entry = await self.backend.get(self._token_key(token))
+        if entry is None:
+            return None
+        generation = await self.backend.get(self._user_key(entry["payload"]["sub"]))
+        if generation != entry["generation"]:
+            return None
+        return entry
+
+    async def set(self, token: str, payload: dict, user: dict):
+        ttl = self.ttl
+        if payload.get("exp") is not None:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl <= 0:
+            return
+
+        user_key = self._user_key(payload["sub"])
+        generation = await self.backend.get(user_key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            await self.backend.set(user_key, generation, self.ttl)
+
+        entry = {"payload": payload, "user": user, "generation": generation}
+        await self.backend.set(self._token_key(token), entry, ttl)
+
+    async def invalidate_user(self, username: str):
+        await self.backend.delete(self._user_key(username))
+
+
+principal_cache = PrincipalCache(LRUCache(PRINCIPAL_CACHE_SIZE), PRINCIPAL_CACHE_TTL)
+
+
+# Cache of serialized responses keyed by URL. Each entry is tagged with the
+# data it was built from and records the tag's generation at lookup time;
+# invalidate() bumps the generation so every entry with that tag misses.
+# Lookup happens before the database read, so a write that lands while a
+# response is being built leaves that entry stale-on-arrival rather than
+# serving it.
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(self.backend, "maxsize", 1) > 0 and self.ttl > 0
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f"response-generation:{tag}"
+
+    # Cached entry for `key` and the current generation of `tag`
+    async def get(self, key: str, tag: str):
+        if not self.enabled:
+            return None, None
+        generation = await self.backend.get(self._tag_key(tag))
+        if generation is None:
+            generation = uuid.uuid4().hex
+            await self.backend.set(self._tag_key(tag), generation, self.ttl)
+        entry = await self.backend.get(f"response:{key}")
+        if entry is None or entry["generation"] != generation:
+            return None, generation
+        return entry, generation
+
+    async def set(self, key: str, generation: Optional[str], entry: dict):
+        if generation is not None:
+            await self.backend.set(
+                f"response:{key}", {**entry, "generation": generation}, self.ttl
+            )
+
+    async def invalidate(self, *tags: str):
+        if self.enabled:
+            for tag in tags:
+                await self.backend.delete(self._tag_key(tag))
+
+
+# Tags of cached task reads
+def task_tag(task_id: int) -> str:
+    return f"task:{task_id}"
+
+
+def user_tasks_tag(user_id: int) -> str:
+    return f"user-tasks:{user_id}"
+
+
+response_cache = ResponseCache(LRUCache(RESPONSE_CACHE_SIZE), RESPONSE_CACHE_TTL)
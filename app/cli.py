@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+
+from app import crud, importer, schemas, sync
+from app.database import SessionLocal, dispose_engine, get_engine, upgrade_database
+
+
+# Import tasks for an existing user from a CSV or NDJSON file
+async def import_tasks(args: argparse.Namespace):
+    file_format = (
+        schemas.TaskFileFormat(args.format)
+        if args.format
+        else importer.format_for_filename(args.path)
+    )
+    async with SessionLocal(bind=get_engine()) as db:
+        user = await crud.get_user_by_username(db, username=args.username)
+        if user is None:
+            raise SystemExit(f"User {args.username!r} not found")
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            summary = await importer.import_tasks(
+                db, stream, file_format, user_id=user.id, chunk_size=args.chunk_size
+            )
+    print(summary.json(indent=2))
+
+
+# Delete task tombstones past the retention period
+async def purge_tombstones(args: argparse.Namespace):
+    async with SessionLocal(bind=get_engine()) as db:
+        removed = await sync.purge_tombstones(db, days=args.days)
+    print(f"Removed {removed} tombstones")
+
+
+# Recompute the per-user task counters from the tasks table
+async def rebuild_stats(args: argparse.Namespace):
+    async with SessionLocal(bind=get_engine()) as db:
+        await crud.rebuild_task_stats(db)
+    print("Task statistics rebuilt")
+
+
+# Apply Alembic migrations
+async def migrate(args: argparse.Namespace):
+    await asyncio.to_thread(upgrade_database, args.revision)
+
+
+# Run a command, closing database connections afterwards so the process can exit
+async def run(args: argparse.Namespace):
+    try:
+        await args.handler(args)
+    finally:
+        await dispose_engine()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="Apply database migrations (alembic upgrade)"
+    )
+    migrate_parser.add_argument("revision", nargs="?", default="head")
+    migrate_parser.set_defaults(handler=migrate)
+
+    import_parser = subparsers.add_parser(
+        "import-tasks", help="Bulk import tasks from a CSV or NDJSON file"
+    )
+    import_parser.add_argument("path")
+    import_parser.add_argument("--username", required=True)
+    import_parser.add_argument(
+        "--format",
+        choices=[file_format.value for file_format in schemas.TaskFileFormat],
+    )
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=importer.IMPORT_CHUNK_SIZE
+    )
+    import_parser.set_defaults(handler=import_tasks)
+
+    purge_parser = subparsers.add_parser(
+        "purge-tombstones", help="Delete task tombstones past the retention period"
+    )
+    purge_parser.add_argument(
+        "--days", type=float, default=sync.TOMBSTONE_RETENTION_DAYS
+    )
+    purge_parser.set_defaults(handler=purge_tombstones)
+
+    stats_parser = subparsers.add_parser(
+        "rebuild-stats", help="Recompute task counters from the tasks table"
+    )
+    stats_parser.set_defaults(handler=rebuild_stats)
+
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Encodings offered to clients, in order of preference; those whose module is
+# not installed (brotli, zstandard) are skipped
+COMPRESSION_ENCODINGS = [
+    name.strip()
+    for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    if name.strip()
+]
+
+# Complete responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "500"))
+
+# Compression level per encoding: gzip 1-9, brotli quality 0-11, zstd 1-22
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# Media types worth compressing. Server-Sent Events are left alone so every
+# event reaches the client as soon as it is sent.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+    "text/plain",
+)
+
+
+# Each compressor turns a body into one encoded stream. compress() returns
+# everything needed to decode `data` right away, so streamed chunks are not
+# held back; finish() ends the stream.
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# Compressor factories of the encodings whose module is installed
+def available_compressors() -> dict:
+    compressors = {"gzip": lambda: GzipCompressor(COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        compressors["br"] = lambda: BrotliCompressor(COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        compressors["zstd"] = lambda: ZstdCompressor(COMPRESSION_ZSTD_LEVEL)
+    return compressors
+
+
+# The first of `encodings` that the Accept-Encoding header allows with the
+# highest quality, or None
+def negotiate(accept_encoding: str, encodings) -> Optional[str]:
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(headers: Headers) -> bool:
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES and "content-encoding" not in headers
+
+
+# ASGI middleware compressing responses with the best encoding the client
+# accepts. A complete body is compressed at once when it reaches the minimum
+# size; a streamed body is compressed chunk by chunk as it is sent, without
+# buffering. The ETag of a compressed response is made weak.
+class CompressionMiddleware:
+    def __init__(self, app, encodings=None, minimum_size=None):
+        self.app = app
+        compressors = available_compressors()
+        self.compressors = {
+            encoding: compressors[encoding]
+            for encoding in (encodings or COMPRESSION_ENCODINGS)
+            if encoding in compressors
+        }
+        self.minimum_size = (
+            COMPRESSION_MINIMUM_SIZE if minimum_size is None else minimum_size
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        encoding = negotiate(accept_encoding, self.compressors)
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether the
+                # response is streamed and how large it is
+                start = message
+                return
+            if message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if start is not None:
+                    headers = MutableHeaders(scope=start)
+                    compressor = self._begin(headers, encoding, len(body), more_body)
+                if compressor is not None:
+                    if more_body:
+                        body = compressor.compress(body)
+                    else:
+                        body = compressor.finish(body)
+                    message = {**message, "body": body}
+                    if start is not None and not more_body:
+                        headers["Content-Length"] = str(len(body))
+                if start is not None:
+                    await send(start)
+                    start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    # Set the response headers for `encoding` and return a compressor, or None
+    # when the response is sent as is
+    def _begin(
+        self,
+        headers: MutableHeaders,
+        encoding: Optional[str],
+        size: int,
+        streamed: bool,
+    ):
+        if not _compressible(headers):
+            return None
+        headers.add_vary_header("Accept-Encoding")
+        if encoding is None or (not streamed and size < self.minimum_size):
+            return None
+        headers["Content-Encoding"] = encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if streamed:
+            del headers["Content-Length"]
+        return self.compressors[encoding]()
@@ -0,0 +1,75 @@
+import hashlib
+from typing import Any, Mapping, Optional
+
+from fastapi import Request, Response
+
+from .cache import response_cache
+from .serialization import dumps
+
+# Endpoint headers stored with a cached response
+CACHED_HEADERS = ("link", "x-next-cursor")
+
+
+# Strong ETag of a response body
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (
+        candidate.strip().removeprefix("W/") for candidate in header.split(",")
+    )
+
+
+# JSON response carrying `etag`, or an empty 304 when the client already has it
+def _respond(request: Request, entry: dict) -> Response:
+    headers = {
+        **entry["headers"],
+        "ETag": entry["etag"],
+        "Cache-Control": "private, no-cache",
+    }
+    if _etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        entry["body"].encode(), media_type="application/json", headers=headers
+    )
+
+
+# A cached response to a read tagged with `tag`. Returns the response (or
+# None on a miss) and a generation to hand back to cache_response(). Reads
+# served by a replica bypass the cache, since a lagging replica would store a
+# stale body under the generation of a newer write.
+async def cached_response(request: Request, tag: str):
+    if getattr(request.state, "read_replica", None) is not None:
+        return None, None
+    entry, generation = await response_cache.get(str(request.url), tag)
+    if entry is None:
+        return None, generation
+    return _respond(request, entry), generation
+
+
+# Serialize `content` as FastAPI would, cache it under the request URL and
+# answer with an ETag (or 304) whether or not the cache is enabled
+async def cache_response(
+    request: Request,
+    generation: Optional[str],
+    content: Any,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    body = dumps(content)
+    entry = {
+        "body": body.decode(),
+        "etag": etag_for(body),
+        "headers": {
+            name: value
+            for name, value in (headers or {}).items()
+            if name.lower() in CACHED_HEADERS
+        },
+    }
+    await response_cache.set(str(request.url), generation, entry)
+    return _respond(request, entry)
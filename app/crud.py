@@ -1,12 +1,69 @@
-from sqlalchemy.orm import Session
+import re
+from datetime import datetime
+from typing import Collection, List, Optional, Tuple
 
-from . import models, schemas
-from .security import get_password_hash
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    Select,
+    any_,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    table,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import events, models, schemas
+from .cache import principal_cache, response_cache, task_tag, user_tasks_tag
+from .security import get_password_hash_async
+
+
+# Apply keyset (after_id) or offset (skip) pagination ordered by id
+def _paginate(stmt: Select, model, skip: int, limit: int, after_id: Optional[int]):
+    if after_id is not None:
+        stmt = stmt.where(model.id > after_id)
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.order_by(model.id).limit(limit)
+
+
+# Task columns for the requested TaskResponse fields (all of them when
+# fields is None), in schema order and always including id. Task reads select
+# these instead of whole ORM objects, returning rows for
+# serialization.rows_response.
+def task_columns(fields: Optional[Collection[str]] = None):
+    return [
+        getattr(models.Task, name)
+        for name in schemas.TaskResponse.__fields__
+        if fields is None or name == "id" or name in fields
+    ]
+
+
+# Filter `column` to the given ids. PostgreSQL gets `= ANY(array)` with a
+# single array parameter, so batches of any size share one prepared statement.
+def _id_in(db: AsyncSession, column, ids: Collection[int]):
+    if db.bind.dialect.name == "postgresql":
+        return column == any_(literal(list(ids), ARRAY(Integer)))
+    return column.in_(ids)
+
+
+# User columns in schemas.UserResponse field order, leaving out the password
+USER_RESPONSE_COLUMNS = [
+    getattr(models.User, name) for name in schemas.UserResponse.__fields__
+]
 
 
 # Create user
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         first_name=user.first_name,
@@ -14,99 +71,389 @@ def create_user(db: Session, user: schemas.UserCreate):
         password=hashed_password,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    await principal_cache.invalidate_user(db_user.username)
     return db_user
 
 
 # Get user by ID
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User).where(models.User.id == user_id))
 
 
 # Get user by username
-def get_user_by_username(db: Session, username: str):
-    return db.query(models.User).filter(models.User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(models.User).where(models.User.username == username))
 
 
 # Get all users
-def get_users(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.User).offset(skip).limit(limit).all()
+async def get_users(
+    db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None
+):
+    stmt = _paginate(select(models.User), models.User, skip, limit, after_id)
+    return (await db.scalars(stmt)).all()
+
+
+# Users with the given ids as {user_id: row}; missing ids are absent
+async def get_users_by_ids(db: AsyncSession, user_ids: Collection[int]):
+    stmt = select(*USER_RESPONSE_COLUMNS).where(_id_in(db, models.User.id, user_ids))
+    return {row.id: row for row in (await db.execute(stmt)).all()}
+
+
+# Drop cached reads of the given tasks of user_id
+async def _invalidate_tasks(user_id: int, task_ids):
+    tags = [task_tag(task_id) for task_id in task_ids]
+    await response_cache.invalidate(user_tasks_tag(user_id), *tags)
 
 
 # Create task
-def create_task(db: Session, task: schemas.TaskCreate, user_id: int):
+async def create_task(db: AsyncSession, task: schemas.TaskCreate, user_id: int):
     db_task = models.Task(**task.dict(), user_id=user_id)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
+    await response_cache.invalidate(user_tasks_tag(user_id))
+    await events.publish_tasks("created", user_id, [db_task])
     return db_task
 
 
 # Get task by ID
-def get_task(db: Session, task_id: int):
-    return db.query(models.Task).filter(models.Task.id == task_id).first()
+async def get_task(
+    db: AsyncSession, task_id: int, fields: Optional[Collection[str]] = None
+):
+    stmt = select(*task_columns(fields)).where(models.Task.id == task_id)
+    return (await db.execute(stmt)).first()
+
+
+# Tasks with the given ids as {task_id: row}; missing ids are absent
+async def get_tasks_by_ids(
+    db: AsyncSession,
+    task_ids: Collection[int],
+    fields: Optional[Collection[str]] = None,
+):
+    stmt = select(*task_columns(fields)).where(_id_in(db, models.Task.id, task_ids))
+    return {row.id: row for row in (await db.execute(stmt)).all()}
 
 
 # Get all tasks
-def get_tasks(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Task).offset(skip).limit(limit).all()
+async def get_tasks(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 10,
+    after_id: Optional[int] = None,
+    fields: Optional[Collection[str]] = None,
+):
+    stmt = select(*task_columns(fields))
+    stmt = _paginate(stmt, models.Task, skip, limit, after_id)
+    return (await db.execute(stmt)).all()
 
 
 # Get tasks by user ID
-def get_user_tasks(db: Session, user_id: int, skip: int = 0, limit: int = 10):
-    return (
-        db.query(models.Task)
-        .filter(models.Task.user_id == user_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+async def get_user_tasks(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 10,
+    after_id: Optional[int] = None,
+    fields: Optional[Collection[str]] = None,
+):
+    stmt = select(*task_columns(fields)).where(models.Task.user_id == user_id)
+    stmt = _paginate(stmt, models.Task, skip, limit, after_id)
+    return (await db.execute(stmt)).all()
+
+
+# Get the owner of a task, or None if the task does not exist
+async def get_task_owner_id(db: AsyncSession, task_id: int):
+    return await db.scalar(select(models.Task.user_id).where(models.Task.id == task_id))
+
+
+# Restrict a task write to the row owned by user_id. Tasks already loaded in
+# the session are synchronized in Python, without another query.
+def _owned_task(stmt, task_id: int, user_id: int):
+    return stmt.where(
+        models.Task.id == task_id, models.Task.user_id == user_id
+    ).execution_options(synchronize_session="evaluate")
+
+
+# Stream TaskResponse columns of a user's tasks through a server-side cursor,
+# yielding lists of rows of at most `batch_size`
+async def stream_user_tasks(db: AsyncSession, user_id: int, batch_size: int = 1000):
+    stmt = (
+        select(*task_columns())
+        .where(models.Task.user_id == user_id)
+        .order_by(models.Task.id)
+        .execution_options(yield_per=batch_size)
     )
+    result = await db.stream(stmt)
+    async for rows in result.mappings().partitions():
+        yield rows
 
 
-# Update task
-def update_task(db: Session, task_id: int, task: schemas.TaskUpdate):
-    db_task = get_task(db, task_id=task_id)
-    if db_task:
-        for var, value in vars(task).items():
-            setattr(db_task, var, value) if value else None
-        db.commit()
-        db.refresh(db_task)
+# Update task owned by user_id; None when no such task exists
+async def update_task(
+    db: AsyncSession, task_id: int, task: schemas.TaskUpdate, user_id: int
+):
+    values = {var: value for var, value in vars(task).items() if value}
+    stmt = _owned_task(update(models.Task), task_id, user_id)
+    db_task = await db.scalar(stmt.values(**values).returning(models.Task))
+    await db.commit()
+    await response_cache.invalidate(task_tag(task_id), user_tasks_tag(user_id))
+    if db_task is not None:
+        await events.publish_tasks("updated", user_id, [db_task])
     return db_task
 
 
-# Delete task
-def delete_task(db: Session, task_id: int):
-    db_task = get_task(db, task_id=task_id)
-    if db_task:
-        db.delete(db_task)
-        db.commit()
+# Delete task owned by user_id; returns the deleted id or None
+async def delete_task(db: AsyncSession, task_id: int, user_id: int):
+    stmt = _owned_task(delete(models.Task), task_id, user_id)
+    deleted_id = await db.scalar(stmt.returning(models.Task.id))
+    if deleted_id is not None:
+        db.add(models.TaskTombstone(task_id=deleted_id, user_id=user_id))
+    await db.commit()
+    await response_cache.invalidate(task_tag(task_id), user_tasks_tag(user_id))
+    if deleted_id is not None:
+        await events.publish_deleted(user_id, [deleted_id])
+    return deleted_id
 
 
-# Mark task as completed
-def mark_task_as_completed(db: Session, task_id: int):
-    db_task = get_task(db, task_id=task_id)
-    if db_task:
-        db_task.status = schemas.TaskStatus.completed
-        db.commit()
-        db.refresh(db_task)
+# Mark task owned by user_id as completed; None when no such task exists
+async def mark_task_as_completed(db: AsyncSession, task_id: int, user_id: int):
+    stmt = _owned_task(update(models.Task), task_id, user_id)
+    db_task = await db.scalar(
+        stmt.values(status=schemas.TaskStatus.completed).returning(models.Task)
+    )
+    await db.commit()
+    await response_cache.invalidate(task_tag(task_id), user_tasks_tag(user_id))
+    if db_task is not None:
+        await events.publish_tasks("completed", user_id, [db_task])
     return db_task
 
 
+# Get owners of the given tasks as {task_id: user_id}; missing tasks are absent
+async def get_task_owner_ids(db: AsyncSession, task_ids: List[int]):
+    rows = await db.execute(
+        select(models.Task.id, models.Task.user_id).where(models.Task.id.in_(task_ids))
+    )
+    return dict(rows.all())
+
+
+# Create tasks for user_id in a single INSERT ... RETURNING
+async def create_tasks(db: AsyncSession, tasks: List[schemas.TaskCreate], user_id: int):
+    rows = [{**task.dict(), "user_id": user_id} for task in tasks]
+    stmt = insert(models.Task).returning(models.Task, sort_by_parameter_order=True)
+    db_tasks = (await db.scalars(stmt, rows)).all()
+    await db.commit()
+    await response_cache.invalidate(user_tasks_tag(user_id))
+    await events.publish_tasks("created", user_id, db_tasks)
+    return db_tasks
+
+
+# Update tasks owned by user_id in one transaction; returns {task_id: task}
+async def update_tasks(
+    db: AsyncSession, tasks: List[schemas.TaskBulkUpdate], user_id: int
+):
+    owners = await get_task_owner_ids(db, [task.id for task in tasks])
+    rows = [
+        {var: value for var, value in vars(task).items() if value or var == "id"}
+        for task in tasks
+        if owners.get(task.id) == user_id
+    ]
+    if not rows:
+        return {}
+
+    await db.execute(update(models.Task), rows)
+    stmt = (
+        select(models.Task)
+        .where(models.Task.id.in_([row["id"] for row in rows]))
+        .execution_options(populate_existing=True)
+    )
+    db_tasks = (await db.scalars(stmt)).all()
+    await db.commit()
+    await _invalidate_tasks(user_id, [db_task.id for db_task in db_tasks])
+    await events.publish_tasks("updated", user_id, db_tasks)
+    return {db_task.id: db_task for db_task in db_tasks}
+
+
+# Mark tasks owned by user_id as completed; returns {task_id: task}
+async def mark_tasks_as_completed(db: AsyncSession, task_ids: List[int], user_id: int):
+    stmt = (
+        update(models.Task)
+        .where(models.Task.id.in_(task_ids), models.Task.user_id == user_id)
+        .values(status=schemas.TaskStatus.completed)
+        .returning(models.Task)
+        .execution_options(synchronize_session="evaluate")
+    )
+    db_tasks = (await db.scalars(stmt)).all()
+    await db.commit()
+    await _invalidate_tasks(user_id, [db_task.id for db_task in db_tasks])
+    await events.publish_tasks("completed", user_id, db_tasks)
+    return {db_task.id: db_task for db_task in db_tasks}
+
+
+# Delete tasks owned by user_id; returns the set of deleted ids
+async def delete_tasks(db: AsyncSession, task_ids: List[int], user_id: int):
+    stmt = (
+        delete(models.Task)
+        .where(models.Task.id.in_(task_ids), models.Task.user_id == user_id)
+        .returning(models.Task.id)
+        .execution_options(synchronize_session="evaluate")
+    )
+    deleted_ids = set((await db.scalars(stmt)).all())
+    if deleted_ids:
+        tombstones = [
+            {"task_id": task_id, "user_id": user_id} for task_id in deleted_ids
+        ]
+        await db.execute(insert(models.TaskTombstone), tombstones)
+    await db.commit()
+    await _invalidate_tasks(user_id, deleted_ids)
+    await events.publish_deleted(user_id, sorted(deleted_ids))
+    return deleted_ids
+
+
 # Filter tasks by status
-def filter_tasks_by_status(
-    db: Session,
+async def filter_tasks_by_status(
+    db: AsyncSession,
     status: schemas.TaskStatus,
     user_id: int = None,
     skip: int = 0,
     limit: int = 10,
+    after_id: Optional[int] = None,
+    fields: Optional[Collection[str]] = None,
 ):
-    query = (
-        db.query(models.Task)
-        .filter(models.Task.status == status)
-        .offset(skip)
+    stmt = select(*task_columns(fields)).where(models.Task.status == status)
+    if user_id:
+        stmt = stmt.where(models.Task.user_id == user_id)
+    stmt = _paginate(stmt, models.Task, skip, limit, after_id)
+    return (await db.execute(stmt)).all()
+
+
+# Change versions below this are final: no running transaction can still
+# commit one. Delta sync reads up to it so it never passes an in-flight write.
+async def get_change_horizon(db: AsyncSession) -> int:
+    if db.bind.dialect.name == "postgresql":
+        stmt = text("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+    else:
+        stmt = text("SELECT version + 1 FROM task_change_clock")
+    return (await db.execute(stmt)).scalar_one()
+
+
+# Tasks of user_id changed after the (change_version, id) position `after` and
+# below the version `until`, in change order
+async def get_task_changes(
+    db: AsyncSession,
+    user_id: int,
+    after: Optional[Tuple[int, int]],
+    until: int,
+    limit: int,
+):
+    stmt = select(models.Task).where(
+        models.Task.user_id == user_id, models.Task.change_version < until
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(models.Task.change_version, models.Task.id) > after)
+    stmt = stmt.order_by(models.Task.change_version, models.Task.id).limit(limit)
+    return (await db.scalars(stmt)).all()
+
+
+# Tombstones of user_id's tasks recorded after the (change_version, id)
+# position `after` and below the version `until`, in change order
+async def get_task_tombstones(
+    db: AsyncSession,
+    user_id: int,
+    after: Tuple[int, int],
+    until: int,
+    limit: int,
+):
+    stmt = (
+        select(models.TaskTombstone)
+        .where(
+            models.TaskTombstone.user_id == user_id,
+            models.TaskTombstone.change_version < until,
+            tuple_(models.TaskTombstone.change_version, models.TaskTombstone.id)
+            > after,
+        )
+        .order_by(models.TaskTombstone.change_version, models.TaskTombstone.id)
         .limit(limit)
     )
-    if user_id:
-        query = query.filter(models.Task.user_id == user_id)
-    return query.all()
+    return (await db.scalars(stmt)).all()
+
+
+# Delete tombstones older than `before`; returns how many were removed
+async def purge_task_tombstones(db: AsyncSession, before: datetime):
+    result = await db.execute(
+        delete(models.TaskTombstone).where(models.TaskTombstone.deleted_at < before)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+# Task counts by status from the maintained counters, for one user or all
+async def get_task_stats(db: AsyncSession, user_id: Optional[int] = None):
+    stmt = select(models.TaskStat.status, func.sum(models.TaskStat.count))
+    if user_id is not None:
+        stmt = stmt.where(models.TaskStat.user_id == user_id)
+    rows = await db.execute(stmt.group_by(models.TaskStat.status))
+    counts = {status: 0 for status in models.TaskStatusEnum}
+    counts.update({status: count for status, count in rows.all()})
+    return counts
+
+
+# Recompute the task counters from the tasks table, e.g. after drift
+async def rebuild_task_stats(db: AsyncSession):
+    if db.bind.dialect.name == "postgresql":
+        # Block task writes until the rebuild commits so none are lost
+        await db.execute(text("LOCK TABLE tasks IN SHARE MODE"))
+    await db.execute(delete(models.TaskStat))
+    await db.execute(
+        insert(models.TaskStat).from_select(
+            ["user_id", "status", "count"],
+            select(models.Task.user_id, models.Task.status, func.count()).group_by(
+                models.Task.user_id, models.Task.status
+            ),
+        )
+    )
+    await db.commit()
+
+
+# FTS5 query matching the tasks of user_id that contain every word of
+# `query`. Words are quoted so user input cannot use FTS5 query syntax, and
+# numbers are limited to the text columns so they cannot match user_id.
+def _fts5_query(user_id: int, query: str) -> str:
+    terms = [
+        f'{{title description}}:"{word}"' if word.isdigit() else f'"{word}"'
+        for word in re.findall(r"\w+", query)
+    ]
+    if not terms:
+        return ""
+    return " AND ".join([f'user_id:"{user_id}"'] + terms)
+
+
+# Tasks of user_id matching the full-text `query`, best matches first
+async def search_tasks(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    skip: int = 0,
+    limit: int = 10,
+    fields: Optional[Collection[str]] = None,
+):
+    stmt = select(*task_columns(fields)).where(models.Task.user_id == user_id)
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.websearch_to_tsquery("english", query)
+        search_vector = literal_column("tasks.search_vector")
+        stmt = stmt.where(search_vector.op("@@")(tsquery)).order_by(
+            func.ts_rank(search_vector, tsquery).desc(), models.Task.id
+        )
+    else:
+        fts_query = _fts5_query(user_id, query)
+        if not fts_query:
+            return []
+        tasks_fts = table("tasks_fts", column("rowid"))
+        # Title matches weigh ten times as much as description matches
+        stmt = (
+            stmt.join(tasks_fts, tasks_fts.c.rowid == models.Task.id)
+            .where(text("tasks_fts MATCH :query").bindparams(query=fts_query))
+            .order_by(text("bm25(tasks_fts, 0.0, 10.0, 1.0)"), models.Task.id)
+        )
+    return (await db.execute(stmt.offset(skip).limit(limit))).all()
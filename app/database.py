@@ -1,24 +1,294 @@
+import itertools
+import logging
 import os
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from fastapi import Request
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+from starlette.datastructures import MutableHeaders
+
+from .instrumentation import instrument_engine
+from .metrics import instrument_pool
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def _getenv_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Run Alembic migrations from the app lifespan instead of a separate step
+DB_AUTO_MIGRATE = _getenv_bool("DB_AUTO_MIGRATE", "false")
+
+# Connection pool of each application process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _getenv_bool("DB_POOL_PRE_PING", "true")
+
+# SQLite files keep aiosqlite's default of a connection per checkout, whose
+# worker thread ends with it; set this to pool them with the settings above
+DB_POOL_SQLITE = _getenv_bool("DB_POOL_SQLITE", "false")
+
+# Open a fresh connection per checkout and leave pooling to an external pooler
+# such as PgBouncer in transaction mode; this also disables prepared statement
+# caching, which transaction pooling does not support
+DB_EXTERNAL_POOLER = _getenv_bool("DB_EXTERNAL_POOLER", "false")
+
+# Prepared statements cached per asyncpg connection, and SQL strings compiled
+# by SQLAlchemy cached per engine (0 disables either cache)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+# How multi-row INSERTs are sent: "values" batches rows into INSERT ... VALUES
+# statements of DB_EXECUTEMANY_PAGE_SIZE rows, "plain" uses the driver's
+# executemany()
+DB_EXECUTEMANY_MODE = os.getenv("DB_EXECUTEMANY_MODE", "values")
+DB_EXECUTEMANY_PAGE_SIZE = int(os.getenv("DB_EXECUTEMANY_PAGE_SIZE", "1000"))
+
+# Comma-separated read replicas used by read-only routes
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+
+# Seconds a replica that failed to connect is skipped
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "30"))
+
+# Seconds a client's reads stay on the primary after it made a change, so it
+# reads its own writes despite replication lag
+DB_PRIMARY_STICKY_SECONDS = int(os.getenv("DB_PRIMARY_STICKY_SECONDS", "5"))
+PRIMARY_STICKY_COOKIE = "db_primary"
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Driver used for each backend on the async request path and by sync tooling
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+SYNC_DRIVERS = {"postgresql": "psycopg2", "sqlite": "pysqlite"}
+
+
+def _with_driver(url: str, drivers: dict) -> URL:
+    url = make_url(url)
+    driver = drivers.get(url.get_backend_name())
+    if driver is None or url.get_driver_name() == driver:
+        return url
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+# URL for the application engine, e.g. postgresql:// -> postgresql+asyncpg://
+def async_database_url(url: str) -> URL:
+    return _with_driver(url, ASYNC_DRIVERS)
+
+
+# URL for sync tooling such as Alembic, e.g. sqlite+aiosqlite:// -> sqlite://
+def sync_database_url(url: str) -> URL:
+    return _with_driver(url, SYNC_DRIVERS)
+
+
+# In-memory SQLite needs its dialect's default single-connection pool
+def _is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+# Keyword arguments for create_async_engine() from the DB_* settings
+def engine_options(url: URL) -> dict:
+    if DB_EXECUTEMANY_MODE not in ("values", "plain"):
+        raise RuntimeError(f"Unknown DB_EXECUTEMANY_MODE {DB_EXECUTEMANY_MODE!r}")
+    options = {
+        "query_cache_size": DB_QUERY_CACHE_SIZE,
+        "use_insertmanyvalues": DB_EXECUTEMANY_MODE == "values",
+        "insertmanyvalues_page_size": DB_EXECUTEMANY_PAGE_SIZE,
+    }
+
+    is_sqlite = url.get_backend_name() == "sqlite"
+    if DB_EXTERNAL_POOLER:
+        options["poolclass"] = NullPool
+    elif not is_sqlite or (DB_POOL_SQLITE and not _is_memory_sqlite(url)):
+        if is_sqlite:
+            options["poolclass"] = AsyncAdaptedQueuePool
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    if url.get_driver_name() == "asyncpg":
+        if DB_EXTERNAL_POOLER:
+            # Unnamed statements only: a server connection may serve
+            # another client by the time a named statement is reused
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        else:
+            options["connect_args"] = {
+                "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE
+            }
+    return options
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engine: Optional[AsyncEngine] = None
+
+
+# Application engine, created on first use so importing the app stays cheap
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set")
+        url = async_database_url(DATABASE_URL)
+        _engine = create_async_engine(url, **engine_options(url))
+        instrument_engine(_engine)
+        instrument_pool(_engine, "primary")
+    return _engine
+
+
+# Read replicas picked round-robin. A replica that fails to connect is
+# skipped for `retry_after` seconds; engines are created on first use.
+class ReplicaSet:
+    def __init__(self, urls, retry_after: float):
+        self.urls = [async_database_url(url) for url in urls]
+        self.retry_after = retry_after
+        self._engines = [None] * len(self.urls)
+        self._down_until = [0.0] * len(self.urls)
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.urls)
+
+    def engine(self, index: int) -> AsyncEngine:
+        if self._engines[index] is None:
+            url = self.urls[index]
+            self._engines[index] = create_async_engine(url, **engine_options(url))
+            instrument_engine(self._engines[index])
+            instrument_pool(self._engines[index], f"replica-{index}")
+        return self._engines[index]
+
+    # Indexes of healthy replicas, starting with the next one in rotation
+    def candidates(self):
+        if not self.urls:
+            return []
+        start = next(self._counter) % len(self.urls)
+        now = time.monotonic()
+        order = self._down_until[start:] + self._down_until[:start]
+        return [
+            (start + offset) % len(self.urls)
+            for offset, down_until in enumerate(order)
+            if down_until <= now
+        ]
+
+    def mark_down(self, index: int):
+        self._down_until[index] = time.monotonic() + self.retry_after
+
+    async def dispose(self):
+        for index, engine in enumerate(self._engines):
+            if engine is not None:
+                await engine.dispose()
+                self._engines[index] = None
+
+
+replicas = ReplicaSet(DATABASE_REPLICA_URLS, DB_REPLICA_RETRY_AFTER)
+
+
+async def dispose_engine():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+    await replicas.dispose()
+
+
+# Sessions are bound per call: SessionLocal(bind=get_engine())
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal(bind=get_engine()) as db:
         yield db
-    finally:
-        db.close()
+
+
+# Session for read-only routes: a healthy replica, or the primary when no
+# replica is configured or reachable, or the client recently made a change.
+# The replica index is left in request.state.read_replica.
+async def get_read_db(request: Request):
+    db = None
+    request.state.read_replica = None
+    if not request.cookies.get(PRIMARY_STICKY_COOKIE):
+        for index in replicas.candidates():
+            db = SessionLocal(bind=replicas.engine(index))
+            try:
+                await db.connection()
+                request.state.read_replica = index
+                break
+            except (DBAPIError, OSError):
+                logger.warning("Read replica %s is unavailable", index, exc_info=True)
+                await db.close()
+                replicas.mark_down(index)
+                db = None
+    if db is None:
+        db = SessionLocal(bind=get_engine())
+    async with db:
+        yield db
+
+
+# ASGI middleware that keeps a client's reads on the primary for a short
+# while after a successful write, via a cookie read by get_read_db()
+class PrimaryStickyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in ("GET", "HEAD", "OPTIONS")
+            or not replicas
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{PRIMARY_STICKY_COOKIE}=1; Max-Age={DB_PRIMARY_STICKY_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+# Apply Alembic migrations up to `revision`
+def upgrade_database(revision: str = "head"):
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    # Keep the application's logging configuration intact
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
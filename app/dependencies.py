@@ -1,32 +1,42 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from . import crud, security
+from . import crud, schemas, security
+from .cache import principal_cache
 from .database import get_db
+from .instrumentation import timed
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/authorize-fastapi-docs")
 
 
 # Get current user from JWT token
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = security.decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
+    with timed("auth"):
+        cached = await principal_cache.get(token)
+        if cached is not None:
+            return schemas.UserResponse.construct(**cached["user"])
 
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
+        payload = security.decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+
+        username: str = payload.get("sub")
+        if username is None:
+            raise credentials_exception
 
-    user = crud.get_user_by_username(db, username=username)
+    with timed("user"):
+        user = await crud.get_user_by_username(db, username=username)
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = schemas.UserResponse.from_orm(user)
+    await principal_cache.set(token, payload, principal.dict())
+    return principal
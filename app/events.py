@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.engine import make_url
+
+from . import metrics, schemas
+
+# "local" delivers events within one process; "postgres" shares them between
+# workers through LISTEN/NOTIFY on DATABASE_URL
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "local")
+
+# Events buffered per subscriber before it is evicted as a slow consumer
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+
+# Seconds between keep-alive comments on an idle event stream
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBERS_EVICTED = metrics.Counter(
+    "event_subscribers_evicted_total",
+    "Event stream subscribers dropped because their queue was full.",
+)
+
+
+# Transport carrying events between workers. attach() is given a callback to
+# run for every event published by any worker, including this one.
+class EventBackend:
+    def attach(self, deliver: Callable[[dict], None]):
+        self.deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def publish(self, events: List[dict]):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+# Delivers events to subscribers of this process only
+class LocalEventBackend(EventBackend):
+    async def publish(self, events: List[dict]):
+        for event in events:
+            self.deliver(event)
+
+
+# Shares events between workers through PostgreSQL LISTEN/NOTIFY. Each event
+# is one notification, so it must stay below PostgreSQL's 8000 byte limit.
+class PostgresEventBackend(EventBackend):
+    channel = "task_events"
+
+    def __init__(self, url: str):
+        self.dsn = make_url(url).set(drivername="postgresql")
+        self._connection = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        import asyncpg
+
+        self._connection = await asyncpg.connect(
+            self.dsn.render_as_string(hide_password=False)
+        )
+        await self._connection.add_listener(self.channel, self._on_notification)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.deliver(json.loads(payload))
+
+    async def publish(self, events: List[dict]):
+        if self._connection is None:
+            raise RuntimeError("Event backend is not started")
+        payloads = [json.dumps(event, separators=(",", ":")) for event in events]
+        # One round trip per batch; a connection runs one query at a time
+        async with self._lock:
+            await self._connection.execute(
+                "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                self.channel,
+                payloads,
+            )
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+class Subscriber:
+    __slots__ = ("user_id", "queue")
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        # One extra slot for the eviction marker
+        self.queue = asyncio.Queue(queue_size + 1)
+
+
+# Fans task events out to the subscribers of each task's owner. A subscriber
+# whose queue is full is evicted: its queue is replaced by a single None
+# marker so the stream ends and the client resynchronizes.
+class EventBus:
+    def __init__(self, backend: EventBackend, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[Subscriber]] = {}
+        self.backend = backend
+
+    @property
+    def backend(self) -> EventBackend:
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: EventBackend):
+        backend.attach(self._deliver)
+        self._backend = backend
+
+    def subscribe(self, user_id: int) -> Subscriber:
+        subscriber = Subscriber(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _deliver(self, event: dict):
+        for subscriber in list(self._subscribers.get(event["user_id"], ())):
+            if subscriber.queue.qsize() < self.queue_size:
+                subscriber.queue.put_nowait(event)
+                continue
+            self.unsubscribe(subscriber)
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+            SUBSCRIBERS_EVICTED.inc()
+
+    # Publish events; the write they describe is already committed, so a
+    # failing backend is logged rather than failing the request
+    async def publish(self, events: List[dict]):
+        if not events:
+            return
+        try:
+            await self.backend.publish(events)
+        except Exception:
+            logger.exception("Failed to publish %d task events", len(events))
+
+    def collect_metrics(self) -> List[str]:
+        return metrics.gauge_lines(
+            "event_subscribers",
+            "Open task event streams.",
+            self.subscriber_count(),
+        )
+
+
+def _backend() -> EventBackend:
+    if EVENT_BACKEND == "postgres":
+        return PostgresEventBackend(os.getenv("DATABASE_URL", ""))
+    if EVENT_BACKEND == "local":
+        return LocalEventBackend()
+    raise RuntimeError(f"Unknown EVENT_BACKEND {EVENT_BACKEND!r}")
+
+
+event_bus = EventBus(_backend(), EVENT_QUEUE_SIZE)
+metrics.register_collector(event_bus.collect_metrics)
+
+
+# Publish `kind` events ("created", "updated", "completed") for tasks written
+# by user_id
+async def publish_tasks(kind: str, user_id: int, tasks):
+    await event_bus.publish(
+        [
+            {
+                "type": kind,
+                "user_id": user_id,
+                "data": jsonable_encoder(schemas.TaskResponse.from_orm(task)),
+            }
+            for task in tasks
+        ]
+    )
+
+
+async def publish_deleted(user_id: int, task_ids):
+    await event_bus.publish(
+        [
+            {"type": "deleted", "user_id": user_id, "data": {"id": task_id}}
+            for task_id in task_ids
+        ]
+    )
+
+
+# A bulk import is announced as a single event rather than one per task
+async def publish_imported(user_id: int, accepted: int):
+    await event_bus.publish(
+        [{"type": "imported", "user_id": user_id, "data": {"accepted": accepted}}]
+    )
+
+
+# Server-Sent Events stream of user_id's task events. Ends with an "evicted"
+# event when the client falls too far behind.
+async def sse_chunks(user_id: int):
+    subscriber = event_bus.subscribe(user_id)
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), EVENT_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                yield "event: evicted\ndata: {}\n\n"
+                return
+            data = json.dumps(event["data"], separators=(",", ":"))
+            yield f"event: {event['type']}\ndata: {data}\n\n"
+    finally:
+        event_bus.unsubscribe(subscriber)
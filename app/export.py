@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import Enum
+
+from . import schemas
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_FIELDS = list(schemas.TaskResponse.__fields__)
+
+MEDIA_TYPES = {
+    schemas.TaskFileFormat.ndjson: "application/x-ndjson",
+    schemas.TaskFileFormat.csv: "text/csv",
+}
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# Encode batches of task rows as newline-delimited JSON, one chunk per batch
+async def ndjson_chunks(batches):
+    async for rows in batches:
+        yield "".join(
+            json.dumps(
+                {field: _plain(row[field]) for field in EXPORT_FIELDS},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            + "\n"
+            for row in rows
+        )
+
+
+# Encode batches of task rows as CSV with a header line
+async def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for rows in batches:
+        writer.writerows(
+            [_plain(row[field]) for field in EXPORT_FIELDS] for row in rows
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    schemas.TaskFileFormat.ndjson: ndjson_chunks,
+    schemas.TaskFileFormat.csv: csv_chunks,
+}
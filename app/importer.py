@@ -0,0 +1,129 @@
+import asyncio
+import csv
+import itertools
+import json
+import os
+from typing import Iterator, List, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import events, models, schemas
+from .cache import response_cache, user_tasks_tag
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+COPY_COLUMNS = ["title", "description", "status", "user_id"]
+
+
+# Guess the file format from its name, defaulting to NDJSON
+def format_for_filename(filename: str) -> schemas.TaskFileFormat:
+    if filename and filename.lower().endswith(".csv"):
+        return schemas.TaskFileFormat.csv
+    return schemas.TaskFileFormat.ndjson
+
+
+# Yield (line number, raw row) pairs; rows that cannot be parsed are yielded
+# as the error message instead of a dict
+def iter_rows(stream: TextIO, file_format: schemas.TaskFileFormat) -> Iterator:
+    if file_format == schemas.TaskFileFormat.csv:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {
+                key: value or None for key, value in row.items() if key
+            }
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(row, dict):
+            row = "Expected a JSON object"
+        yield line_number, row
+
+
+# Read and validate up to `size` rows; returns (records, errors, rows read)
+def _read_chunk(rows: Iterator, size: int, user_id: int) -> Tuple[List, List, int]:
+    records, errors, count = [], [], 0
+    for line_number, row in itertools.islice(rows, size):
+        count += 1
+        if isinstance(row, str):
+            errors.append(schemas.TaskImportError(line=line_number, detail=row))
+            continue
+        try:
+            task = schemas.TaskCreate(**row)
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                for error in exc.errors()
+            )
+            errors.append(schemas.TaskImportError(line=line_number, detail=detail))
+            continue
+        records.append({**task.dict(), "user_id": user_id})
+    return records, errors, count
+
+
+# Load validated records: COPY on PostgreSQL, multi-row INSERT elsewhere
+async def _load_records(db: AsyncSession, records: List[dict]):
+    if db.bind.dialect.name == "postgresql":
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            models.Task.__tablename__,
+            columns=COPY_COLUMNS,
+            records=[
+                (
+                    record["title"],
+                    record["description"],
+                    models.TaskStatusEnum(record["status"]).name,
+                    record["user_id"],
+                )
+                for record in records
+            ],
+        )
+    else:
+        await db.execute(insert(models.Task).values(records))
+
+
+# Import tasks for user_id from a CSV/NDJSON stream in chunks, in one transaction
+async def import_tasks(
+    db: AsyncSession,
+    stream: TextIO,
+    file_format: schemas.TaskFileFormat,
+    user_id: int,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> schemas.TaskImportSummary:
+    rows = iter_rows(stream, file_format)
+    accepted, rejected, errors = 0, 0, []
+    if db.bind.dialect.name == "postgresql":
+        # The asyncpg adapter begins its transaction on the first statement it
+        # executes, and COPY bypasses it; without this each chunk would
+        # commit on its own when nothing ran on the session yet
+        await db.execute(text("SELECT 1"))
+    while True:
+        # Parsing and validation are CPU-bound, so keep them off the event loop
+        records, chunk_errors, count = await asyncio.to_thread(
+            _read_chunk, rows, chunk_size, user_id
+        )
+        if not count:
+            break
+        if records:
+            await _load_records(db, records)
+        accepted += len(records)
+        rejected += len(chunk_errors)
+        errors.extend(chunk_errors[: IMPORT_MAX_ERRORS - len(errors)])
+
+    await db.commit()
+    await response_cache.invalidate(user_tasks_tag(user_id))
+    if accepted:
+        await events.publish_imported(user_id, accepted)
+    return schemas.TaskImportSummary(
+        accepted=accepted, rejected=rejected, errors=errors
+    )
@@ -0,0 +1,189 @@
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+
+from . import metrics
+
+# Warn when a single request runs more SQL statements than this (0 disables)
+QUERY_COUNT_WARN_THRESHOLD = int(os.getenv("QUERY_COUNT_WARN_THRESHOLD", "10"))
+
+logger = logging.getLogger("app.performance")
+
+
+# Per-request phase durations (seconds) and SQL statement accounting
+class RequestTimings:
+    __slots__ = ("started", "phases", "query_count", "endpoint_finished")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.query_count = 0
+        self.endpoint_finished = None
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        entries = []
+        for phase, seconds in self.phases.items():
+            entry = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == "db":
+                entry += f';desc="{self.query_count} queries"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+# Time a block as `phase` of the current request; a no-op outside requests
+@contextmanager
+def timed(phase: str):
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_timings.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current_timings.get()
+    if timings is None or not conn.info.get("query_started"):
+        return
+    timings.add("db", time.perf_counter() - conn.info["query_started"].pop())
+    timings.query_count += 1
+
+
+# Count and time SQL statements executed on `engine` per request
+def instrument_engine(engine: AsyncEngine):
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Route class that times the endpoint body and the response serialization
+# that FastAPI performs after it returns, and records per-route metrics
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args, **kw):
+            with timed("endpoint"):
+                result = await endpoint(*args, **kw)
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.endpoint_finished = time.perf_counter()
+            return result
+
+        super().__init__(path, timed_endpoint, **kwargs)
+
+        labels = (",".join(sorted(self.methods)), self.path_format)
+        self.duration_metric = metrics.REQUEST_DURATION.labels(*labels)
+        self.in_progress_metric = metrics.REQUESTS_IN_PROGRESS.labels(*labels)
+        self.errors_metric = metrics.REQUEST_ERRORS.labels(*labels)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            self.in_progress_metric.inc()
+            started = time.perf_counter()
+            try:
+                response = await handler(request)
+            except HTTPException:
+                raise
+            except Exception:
+                self.errors_metric.inc()
+                raise
+            finally:
+                self.in_progress_metric.dec()
+                self.duration_metric.observe(time.perf_counter() - started)
+            if response.status_code >= 500:
+                self.errors_metric.inc()
+
+            timings = _current_timings.get()
+            if timings is not None and timings.endpoint_finished is not None:
+                timings.add(
+                    "serialize", time.perf_counter() - timings.endpoint_finished
+                )
+            return response
+
+        return timed_handler
+
+
+# ASGI middleware that collects RequestTimings for each HTTP request, emits
+# them as a Server-Timing header and logs them as structured fields
+class ServerTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        status_code = None
+
+        async def send_with_timings(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings.add("total", time.perf_counter() - timings.started)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current_timings.reset(token)
+            self._log(scope, status_code, timings)
+
+    def _log(self, scope, status_code, timings: RequestTimings):
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status_code": status_code,
+            "duration_ms": round((time.perf_counter() - timings.started) * 1000, 2),
+            "query_count": timings.query_count,
+            "phases_ms": {
+                phase: round(seconds * 1000, 2)
+                for phase, seconds in timings.phases.items()
+            },
+        }
+        logger.info("request", extra=fields)
+        if 0 < QUERY_COUNT_WARN_THRESHOLD < timings.query_count:
+            logger.warning(
+                "%s %s ran %d SQL statements",
+                scope["method"],
+                scope["path"],
+                timings.query_count,
+                extra=fields,
+            )
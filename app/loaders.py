@@ -0,0 +1,73 @@
+import functools
+import os
+from typing import Awaitable, Callable, Collection, Dict, Hashable, List, Optional
+
+from fastapi import Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud
+from .database import get_read_db
+
+# Most ids accepted by one batch read
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))
+
+
+# Request-scoped lookup by id. Ids not seen yet in the request are fetched
+# together in one query; every result, including misses, is memoized so a
+# repeated lookup does not hit the database again.
+class Loader:
+    def __init__(self, fetch: Callable[[List[Hashable]], Awaitable[Dict]]):
+        self._fetch = fetch
+        self._memo = {}
+
+    # Results for `keys` in the same order, None where nothing was found
+    async def load_many(self, keys) -> list:
+        pending = [key for key in dict.fromkeys(keys) if key not in self._memo]
+        if pending:
+            found = await self._fetch(pending)
+            for key in pending:
+                self._memo[key] = found.get(key)
+        return [self._memo[key] for key in keys]
+
+    async def load(self, key):
+        return (await self.load_many([key]))[0]
+
+
+# Loaders of one request, reading through its session
+class Loaders:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.users = Loader(functools.partial(crud.get_users_by_ids, db))
+        self._tasks = {}
+
+    # Task loader for a sparse fieldset; each fieldset is memoized separately
+    def tasks(self, fields: Optional[Collection[str]] = None) -> Loader:
+        key = None if fields is None else frozenset(fields)
+        if key not in self._tasks:
+            self._tasks[key] = Loader(
+                functools.partial(crud.get_tasks_by_ids, self.db, fields=fields)
+            )
+        return self._tasks[key]
+
+
+# FastAPI resolves a dependency once per request, so every dependency and the
+# endpoint of one request share these loaders
+def get_loaders(db: AsyncSession = Depends(get_read_db)) -> Loaders:
+    return Loaders(db)
+
+
+# Ids from `ids=1,2,3`, in request order without duplicates
+def batch_ids(ids: str = Query(..., description="Comma-separated ids")) -> List[int]:
+    try:
+        values = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="ids must be comma-separated integers"
+        )
+    values = list(dict.fromkeys(values))
+    if len(values) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch size exceeds the limit of {BATCH_MAX_IDS} items",
+        )
+    return values
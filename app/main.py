@@ -1,13 +1,57 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
 
-from app.database import engine
-from app.models import Base
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from app import metrics, security
+from app.compression import CompressionMiddleware
+from app.database import (
+    DB_AUTO_MIGRATE,
+    PrimaryStickyMiddleware,
+    dispose_engine,
+    upgrade_database,
+)
+from app.events import event_bus
+from app.instrumentation import ServerTimingMiddleware
 from app.routers import tasks, users
 
-Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_MIGRATE:
+        await asyncio.to_thread(upgrade_database)
+    await event_bus.backend.start()
+    yield
+    await event_bus.backend.stop()
+    security.password_hasher.shutdown()
+    await dispose_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(PrimaryStickyMiddleware)
+# Inside ServerTimingMiddleware so compression counts towards the total
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+
+
+@app.exception_handler(security.PasswordHasherBusy)
+async def password_hasher_busy_handler(
+    request: Request, exc: security.PasswordHasherBusy
+):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
-app = FastAPI()
 
 app.include_router(users.router)
 app.include_router(tasks.router)
@@ -0,0 +1,303 @@
+import time
+from bisect import bisect_left
+from typing import Callable, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import Pool, QueuePool
+
+# Metrics are updated from the event loop thread only (SQLAlchemy pool events
+# run in greenlets on that same thread), so plain attribute updates are safe
+# without locks. Labelled children are created once and kept by their callers,
+# so recording a value does not allocate.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_metrics = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _metrics.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_labels(self.labelnames, values)} {_format(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format(bound)
+            labels = _labels(self.labelnames, values, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+# Register a callback returning exposition lines computed at scrape time
+def register_collector(collector: Callable[[], List[str]]):
+    _collectors.append(collector)
+
+
+# All metrics in the Prometheus text exposition format
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling requests, per route.",
+    ("method", "route"),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled, per route.",
+    ("method", "route"),
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total",
+    "Requests that failed with a server error, per route.",
+    ("method", "route"),
+)
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool, per engine.",
+    ("engine",),
+)
+POOL_CONNECTION_HELD = Histogram(
+    "db_pool_connection_held_seconds",
+    "Time a connection stays checked out of the pool, per engine.",
+    ("engine",),
+)
+
+PASSWORD_HASH_QUEUE = Histogram(
+    "password_hash_queue_seconds",
+    "Time password hashing calls wait for a worker.",
+)
+PASSWORD_HASH_RUN = Histogram(
+    "password_hash_run_seconds",
+    "Time spent hashing or verifying a password in a worker.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+# Pools have no event before a checkout, so the wait is timed around the
+# pool's own _do_get. With a connection per checkout (NullPool) that is the
+# time to connect.
+def _time_checkouts(pool: Pool, checkout_wait):
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            checkout_wait.observe(time.perf_counter() - started)
+
+    pool._do_get = timed_do_get
+
+
+# Instrumented engines by name; a name instrumented again replaces its engine
+_engines = {}
+
+
+# Record checkout waits and connection hold times of the pool `engine` was
+# created with, whatever its class, and expose its occupancy gauges, all
+# labelled with `name`
+def instrument_pool(engine: AsyncEngine, name: str):
+    _engines[name] = engine
+    sync_engine = engine.sync_engine
+    checkout_wait = POOL_CHECKOUT_WAIT.labels(name)
+    connection_held = POOL_CONNECTION_HELD.labels(name)
+
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            connection_held.observe(time.perf_counter() - checked_out_at)
+
+    def on_engine_disposed(engine):
+        # dispose() swaps in a new pool; event listeners carry over, not the
+        # timing
+        _time_checkouts(engine.pool, checkout_wait)
+
+    event.listen(sync_engine.pool, "checkout", _on_checkout)
+    event.listen(sync_engine.pool, "checkin", on_checkin)
+    event.listen(sync_engine, "engine_disposed", on_engine_disposed)
+    _time_checkouts(sync_engine.pool, checkout_wait)
+
+
+def gauge_lines(name: str, documentation: str, value: float) -> List[str]:
+    return [
+        f"# HELP {name} {documentation}",
+        f"# TYPE {name} gauge",
+        f"{name} {_format(value)}",
+    ]
+
+
+_POOL_GAUGES = (
+    ("db_pool_size", "Configured pool size, per engine.", QueuePool.size),
+    (
+        "db_pool_checked_out",
+        "Connections checked out, per engine.",
+        QueuePool.checkedout,
+    ),
+    (
+        "db_pool_overflow",
+        "Connections open beyond the pool size, per engine.",
+        lambda pool: max(pool.overflow(), 0),
+    ),
+)
+
+
+def _collect_pool() -> List[str]:
+    pools = [
+        (name, engine.sync_engine.pool)
+        for name, engine in _engines.items()
+        if isinstance(engine.sync_engine.pool, QueuePool)
+    ]
+    if not pools:
+        return []
+    lines = []
+    for metric, documentation, value in _POOL_GAUGES:
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} gauge")
+        for name, pool in pools:
+            labels = _labels(("engine",), (name,))
+            lines.append(f"{metric}{labels} {_format(value(pool))}")
+    return lines
+
+
+register_collector(_collect_pool)
@@ -1,7 +1,23 @@
 import enum
+from datetime import datetime, timezone
 
-from sqlalchemy import Column, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    event,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 
 from .database import Base
 
@@ -13,6 +29,26 @@ class TaskStatusEnum(str, enum.Enum):
     completed = "Completed"
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# Timezone-aware UTC timestamp; SQLite stores these without an offset
+class UTCDateTime(TypeDecorator):
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
 # User Model
 class User(Base):
     __tablename__ = "users"
@@ -29,13 +65,296 @@ class User(Base):
 # Task Model
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_user_id_id", "user_id", "id"),
+        Index("ix_tasks_status_id", "status", "id"),
+        Index("ix_tasks_user_id_change_version_id", "user_id", "change_version", "id"),
+        # Open tasks per user; partial indexes are only created on PostgreSQL
+        Index(
+            "ix_tasks_open_user_id_id",
+            "user_id",
+            "id",
+            postgresql_where=text("status <> 'completed'"),
+        ).ddl_if(dialect="postgresql"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     status = Column(Enum(TaskStatusEnum), nullable=False, default=TaskStatusEnum.new)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
+    created_at = Column(
+        UTCDateTime, nullable=False, default=utcnow, server_default=func.now()
+    )
+    updated_at = Column(
+        UTCDateTime,
+        nullable=False,
+        default=utcnow,
+        onupdate=utcnow,
+        server_default=func.now(),
+    )
+    # Commit-ordered position for delta sync, set by TASK_CHANGE_VERSION_DDL
+    change_version = Column(BigInteger, nullable=False, server_default="0")
 
     user = relationship("User", back_populates="tasks")
+
+
+# Deleted tasks, kept so sync clients can learn about deletions
+class TaskTombstone(Base):
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index(
+            "ix_task_tombstones_user_id_change_version_id",
+            "user_id",
+            "change_version",
+            "id",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    deleted_at = Column(
+        UTCDateTime, nullable=False, default=utcnow, server_default=func.now()
+    )
+    change_version = Column(BigInteger, nullable=False, server_default="0")
+
+
+# Number of tasks per user and status, kept current by database triggers on
+# tasks so every write path (including COPY and bulk statements) counts
+class TaskStat(Base):
+    __tablename__ = "task_stats"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    status = Column(Enum(TaskStatusEnum), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Keep in sync with the add_task_stats migration
+TASK_STATS_TRIGGERS = {
+    "sqlite": [
+        """
+        CREATE TRIGGER task_stats_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_stats (user_id, status, count)
+            VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER task_stats_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_stats SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+        END
+        """,
+        """
+        CREATE TRIGGER task_stats_update AFTER UPDATE OF user_id, status ON tasks
+        WHEN OLD.user_id IS NOT NEW.user_id OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE task_stats SET count = count - 1
+            WHERE user_id = OLD.user_id AND status = OLD.status;
+            INSERT INTO task_stats (user_id, status, count)
+            VALUES (NEW.user_id, NEW.status, 1)
+            ON CONFLICT (user_id, status) DO UPDATE SET count = count + 1;
+        END
+        """,
+    ],
+    # Statement-level triggers aggregate each statement's rows, so bulk
+    # writes touch every counter once
+    "postgresql": [
+        """
+        CREATE OR REPLACE FUNCTION task_stats_add() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO task_stats (user_id, status, count)
+            SELECT user_id, status, count(*) FROM new_rows GROUP BY user_id, status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+            RETURN NULL;
+        END $$
+        """,
+        """
+        CREATE OR REPLACE FUNCTION task_stats_remove() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE task_stats SET count = task_stats.count - removed.count
+            FROM (
+                SELECT user_id, status, count(*) AS count
+                FROM old_rows GROUP BY user_id, status
+            ) AS removed
+            WHERE task_stats.user_id = removed.user_id
+                AND task_stats.status = removed.status;
+            RETURN NULL;
+        END $$
+        """,
+        """
+        CREATE OR REPLACE FUNCTION task_stats_move() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE task_stats SET count = task_stats.count - moved.count
+            FROM (
+                SELECT old_rows.user_id, old_rows.status, count(*) AS count
+                FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+                WHERE (old_rows.user_id, old_rows.status)
+                    IS DISTINCT FROM (new_rows.user_id, new_rows.status)
+                GROUP BY old_rows.user_id, old_rows.status
+            ) AS moved
+            WHERE task_stats.user_id = moved.user_id
+                AND task_stats.status = moved.status;
+            INSERT INTO task_stats (user_id, status, count)
+            SELECT new_rows.user_id, new_rows.status, count(*)
+            FROM old_rows JOIN new_rows ON new_rows.id = old_rows.id
+            WHERE (old_rows.user_id, old_rows.status)
+                IS DISTINCT FROM (new_rows.user_id, new_rows.status)
+            GROUP BY new_rows.user_id, new_rows.status
+            ON CONFLICT (user_id, status)
+            DO UPDATE SET count = task_stats.count + EXCLUDED.count;
+            RETURN NULL;
+        END $$
+        """,
+        """
+        CREATE TRIGGER task_stats_insert AFTER INSERT ON tasks
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_stats_add()
+        """,
+        """
+        CREATE TRIGGER task_stats_delete AFTER DELETE ON tasks
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_stats_remove()
+        """,
+        """
+        CREATE TRIGGER task_stats_update AFTER UPDATE ON tasks
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION task_stats_move()
+        """,
+    ],
+}
+
+# Full-text index over task titles and descriptions. PostgreSQL keeps a
+# generated tsvector column with a GIN index; SQLite an FTS5 table over tasks
+# kept current by triggers, which also indexes user_id so a search is scoped
+# to one user inside the index. Keep in sync with the add_task_search
+# migration.
+TASK_SEARCH_DDL = {
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE tasks_fts USING fts5(
+            user_id, title, description, content='tasks', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, user_id, title, description)
+            VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+        END
+        """,
+        """
+        CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+            VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+        END
+        """,
+        """
+        CREATE TRIGGER tasks_fts_update AFTER UPDATE OF user_id, title, description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, user_id, title, description)
+            VALUES ('delete', OLD.id, OLD.user_id, OLD.title, OLD.description);
+            INSERT INTO tasks_fts (rowid, user_id, title, description)
+            VALUES (NEW.id, NEW.user_id, NEW.title, NEW.description);
+        END
+        """,
+    ],
+    "postgresql": [
+        """
+        ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX ix_tasks_search_vector ON tasks USING gin (search_vector)",
+    ],
+}
+
+# Change versions of tasks and tombstones, stamped on every insert and update
+# so delta sync can tell which changes are final. PostgreSQL stamps the
+# writing transaction's id: every version below the oldest running
+# transaction (txid_snapshot_xmin) is committed or rolled back. SQLite allows
+# one writer at a time, so a counter bumped inside the write transaction
+# follows commit order. Keep in sync with the add_task_change_versions
+# migration.
+TASK_CHANGE_VERSION_DDL = {
+    "sqlite": [
+        "CREATE TABLE task_change_clock (version INTEGER NOT NULL)",
+        "INSERT INTO task_change_clock (version) VALUES (0)",
+        """
+        CREATE TRIGGER tasks_change_version_insert AFTER INSERT ON tasks
+        BEGIN
+            UPDATE task_change_clock SET version = version + 1;
+            UPDATE tasks SET change_version = (SELECT version FROM task_change_clock)
+            WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER tasks_change_version_update AFTER UPDATE ON tasks
+        WHEN NEW.change_version IS OLD.change_version
+        BEGIN
+            UPDATE task_change_clock SET version = version + 1;
+            UPDATE tasks SET change_version = (SELECT version FROM task_change_clock)
+            WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER task_tombstones_change_version AFTER INSERT ON task_tombstones
+        BEGIN
+            UPDATE task_change_clock SET version = version + 1;
+            UPDATE task_tombstones
+            SET change_version = (SELECT version FROM task_change_clock)
+            WHERE id = NEW.id;
+        END
+        """,
+    ],
+    # Inserts, including COPY, take the column default; updates a trigger
+    "postgresql": [
+        "ALTER TABLE tasks ALTER COLUMN change_version SET DEFAULT txid_current()",
+        """
+        ALTER TABLE task_tombstones
+        ALTER COLUMN change_version SET DEFAULT txid_current()
+        """,
+        """
+        CREATE OR REPLACE FUNCTION tasks_change_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.change_version := txid_current();
+            RETURN NEW;
+        END $$
+        """,
+        """
+        CREATE TRIGGER tasks_change_version BEFORE UPDATE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_change_version()
+        """,
+    ],
+}
+
+for _ddl in (TASK_STATS_TRIGGERS, TASK_SEARCH_DDL, TASK_CHANGE_VERSION_DDL):
+    for _dialect, _statements in _ddl.items():
+        for _statement in _statements:
+            event.listen(
+                Base.metadata,
+                "after_create",
+                DDL(_statement).execute_if(dialect=_dialect),
+            )
+
+# The FTS5 and clock tables are not in the metadata, so drop_all() would leave
+# them behind
+for _table in ("tasks_fts", "task_change_clock"):
+    event.listen(
+        Base.metadata,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {_table}").execute_if(dialect="sqlite"),
+    )
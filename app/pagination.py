@@ -0,0 +1,43 @@
+import base64
+import binascii
+import json
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Request, Response
+
+
+# Encode a keyset position as an opaque, URL-safe cursor
+def encode_cursor(**key) -> str:
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+# Decode a cursor produced by encode_cursor, checking the expected key columns
+def decode_cursor(cursor: str, *fields: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(key, dict) or any(
+        not isinstance(key.get(field), int) for field in fields
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+# Build the cursor for the page after `rows`, or None on the last page
+def next_cursor(rows: Sequence, limit: int, **key) -> Optional[str]:
+    if limit <= 0 or len(rows) < limit:
+        return None
+    return encode_cursor(**key, id=rows[-1].id)
+
+
+# Advertise the next page through `Link` and `X-Next-Cursor` headers
+def add_next_link(request: Request, response: Response, cursor: Optional[str]):
+    if cursor is None:
+        return
+    url = request.url.remove_query_params("skip").include_query_params(cursor=cursor)
+    response.headers["Link"] = f'<{url}>; rel="next"'
+    response.headers["X-Next-Cursor"] = cursor
@@ -0,0 +1,151 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from . import metrics, security
+from .cache import principal_cache
+from .dependencies import oauth2_scheme
+from .instrumentation import timed
+
+
+def _getenv_rate(name: str, default: str) -> Optional[Tuple[int, float]]:
+    value = os.getenv(name, default).strip()
+    if not value:
+        return None
+    capacity, _, seconds = value.partition("/")
+    try:
+        rate = int(capacity), float(seconds)
+    except ValueError:
+        rate = None
+    if rate is None or rate[0] <= 0 or not 0 < rate[1] < math.inf:
+        raise RuntimeError(
+            f"Invalid {name} {value!r}, expected N/S with N and S above 0"
+        )
+    return rate
+
+
+# Token bucket limits written as "N/S": bursts of up to N requests, refilled
+# at N per S seconds. An empty value disables the limit.
+# Registration and login requests per client IP
+USERS_RATE_LIMIT_PER_IP = _getenv_rate("USERS_RATE_LIMIT_PER_IP", "30/60")
+# Login attempts per username, from any IP
+LOGIN_RATE_LIMIT_PER_USERNAME = _getenv_rate("LOGIN_RATE_LIMIT_PER_USERNAME", "10/60")
+# Requests to the task routes per authenticated user
+TASKS_RATE_LIMIT_PER_PRINCIPAL = _getenv_rate(
+    "TASKS_RATE_LIMIT_PER_PRINCIPAL", "600/60"
+)
+
+# Buckets kept by the in-process store; the least recently used are dropped
+RATE_LIMIT_STORE_SIZE = int(os.getenv("RATE_LIMIT_STORE_SIZE", "100000"))
+
+RATE_LIMITED = metrics.Counter(
+    "rate_limited_requests_total",
+    "Requests rejected by a rate limit, per limit.",
+    ("limit",),
+)
+
+
+class RateLimitExceeded(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.retry_after = retry_after
+
+
+# Storage of token buckets. take() must update a bucket atomically so a shared
+# backend (e.g. a Redis script) can enforce one limit across workers.
+class RateLimitBackend:
+    # Take a token from the bucket `key`; returns 0 when one was available,
+    # otherwise the seconds until the next token
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+# In-process buckets, at most `maxsize` of them, refilled by `clock`. Dropping
+# the least recently used bucket at worst hands that key a full bucket again.
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, maxsize: int, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: int, period: float) -> float:
+        rate = capacity / period
+        now = self.clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    # Count a request against `rate` for `key` within `limit`, raising
+    # RateLimitExceeded when its bucket is empty
+    async def hit(self, limit: str, key: str, rate: Optional[Tuple[int, float]]):
+        if rate is None:
+            return
+        wait = await self.backend.take(f"{limit}:{key}", *rate)
+        if wait > 0:
+            RATE_LIMITED.labels(limit).inc()
+            raise RateLimitExceeded(math.ceil(wait))
+
+
+rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_STORE_SIZE))
+
+
+# Dependency of the unauthenticated user routes (register and login). Route
+# dependencies run before the endpoint's own, so rejected requests never
+# reach the database.
+async def limit_by_ip(request: Request):
+    host = request.client.host if request.client else "unknown"
+    await rate_limiter.hit("ip", host, USERS_RATE_LIMIT_PER_IP)
+
+
+# Called by the login routes before the user lookup and password check
+async def limit_login(username: str):
+    await rate_limiter.hit("login", username.lower(), LOGIN_RATE_LIMIT_PER_USERNAME)
+
+
+# Router dependency for the task routes. The user comes from the principal
+# cache, as in get_current_user, and the token is only decoded on a miss;
+# invalid tokens are left for get_current_user to reject.
+async def limit_by_principal(token: str = Depends(oauth2_scheme)):
+    with timed("auth"):
+        cached = await principal_cache.get(token)
+        if cached is not None:
+            payload = cached["payload"]
+        else:
+            payload = security.decode_access_token(token)
+    if payload is None or payload.get("sub") is None:
+        return
+    await rate_limiter.hit("principal", payload["sub"], TASKS_RATE_LIMIT_PER_PRINCIPAL)
@@ -1,130 +1,444 @@
-from typing import List
+import io
+import os
+from typing import List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, dependencies, models, schemas
-from app.database import get_db
+from app import (
+    cache,
+    conditional,
+    crud,
+    dependencies,
+    events,
+    export,
+    importer,
+    loaders,
+    pagination,
+    ratelimit,
+    schemas,
+    serialization,
+    sync,
+)
+from app.database import get_db, get_read_db
+from app.instrumentation import TimedRoute
 
 router = APIRouter(
     prefix="/tasks",
     tags=["tasks"],
+    route_class=TimedRoute,
+    dependencies=[Depends(ratelimit.limit_by_principal)],
 )
 
+TASKS_BULK_MAX_ITEMS = int(os.getenv("TASKS_BULK_MAX_ITEMS", "500"))
+
+
+# Reject batches above the configured size
+def _check_batch_size(items: list):
+    if len(items) > TASKS_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch size exceeds the limit of {TASKS_BULK_MAX_ITEMS} items",
+        )
+
+
+# Task fields requested with `fields=id,title,...`, or None for all of them.
+# The id is always returned.
+def _task_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated task fields to return (id is always included)",
+    )
+) -> Optional[Set[str]]:
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(schemas.TaskResponse.__fields__)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return names
+
+
+# Per-item results for a batch of task ids, in request order. `done` maps the
+# ids that were written to their task (or None when there is nothing to return).
+async def _bulk_results(db: AsyncSession, task_ids: List[int], done: dict):
+    missing = [task_id for task_id in task_ids if task_id not in done]
+    owners = await crud.get_task_owner_ids(db, missing) if missing else {}
+
+    results = []
+    for index, task_id in enumerate(task_ids):
+        if task_id in done:
+            result = schemas.TaskBulkResult(
+                index=index, id=task_id, status_code=200, task=done[task_id]
+            )
+        elif task_id in owners:
+            result = schemas.TaskBulkResult(
+                index=index,
+                id=task_id,
+                status_code=403,
+                detail="Not enough permissions",
+            )
+        else:
+            result = schemas.TaskBulkResult(
+                index=index, id=task_id, status_code=404, detail="Task not found"
+            )
+        results.append(result)
+    return results
+
 
 # Create a new task (authenticated users only)
 @router.post("/", response_model=schemas.TaskResponse)
-def create_task(
+async def create_task(
     task: schemas.TaskCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    return await crud.create_task(db=db, task=task, user_id=current_user.id)
+
+
+# Create several tasks in one transaction (authenticated users only)
+@router.post("/bulk", response_model=List[schemas.TaskBulkResult])
+async def create_tasks_bulk(
+    tasks: List[schemas.TaskCreate],
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    _check_batch_size(tasks)
+    if not tasks:
+        return []
+    db_tasks = await crud.create_tasks(db=db, tasks=tasks, user_id=current_user.id)
+    return [
+        schemas.TaskBulkResult(
+            index=index, id=db_task.id, status_code=200, task=db_task
+        )
+        for index, db_task in enumerate(db_tasks)
+    ]
+
+
+# Update several tasks in one transaction (task owner only)
+@router.patch("/bulk", response_model=List[schemas.TaskBulkResult])
+async def update_tasks_bulk(
+    tasks: List[schemas.TaskBulkUpdate],
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    _check_batch_size(tasks)
+    if not tasks:
+        return []
+    updated = await crud.update_tasks(db=db, tasks=tasks, user_id=current_user.id)
+    return await _bulk_results(db, [task.id for task in tasks], updated)
+
+
+# Mark several tasks as completed in one statement (task owner only)
+@router.patch("/bulk/complete", response_model=List[schemas.TaskBulkResult])
+async def complete_tasks_bulk(
+    task_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    _check_batch_size(task_ids)
+    if not task_ids:
+        return []
+    completed = await crud.mark_tasks_as_completed(
+        db=db, task_ids=task_ids, user_id=current_user.id
+    )
+    return await _bulk_results(db, task_ids, completed)
+
+
+# Delete several tasks in one statement (task owner only)
+@router.delete("/bulk", response_model=List[schemas.TaskBulkResult])
+async def delete_tasks_bulk(
+    task_ids: List[int] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    _check_batch_size(task_ids)
+    if not task_ids:
+        return []
+    deleted_ids = await crud.delete_tasks(
+        db=db, task_ids=task_ids, user_id=current_user.id
+    )
+    return await _bulk_results(db, task_ids, dict.fromkeys(deleted_ids))
+
+
+# Stream all of the current user's tasks as NDJSON or CSV
+@router.get("/export", response_class=StreamingResponse)
+async def export_tasks(
+    export_format: schemas.TaskFileFormat = Query(
+        schemas.TaskFileFormat.ndjson, alias="format"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    batches = crud.stream_user_tasks(
+        db, user_id=current_user.id, batch_size=export.EXPORT_BATCH_SIZE
+    )
+    return StreamingResponse(
+        export.ENCODERS[export_format](batches),
+        media_type=export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="tasks.{export_format.value}"'
+        },
+    )
+
+
+# Full-text search over the current user's tasks, best matches first
+@router.get("/search", response_model=List[schemas.TaskResponse])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = 0,
+    limit: int = 10,
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    tasks = await crud.search_tasks(
+        db, user_id=current_user.id, query=q, skip=skip, limit=limit, fields=fields
+    )
+    return serialization.rows_response(tasks)
+
+
+# Get several tasks by id with one query, in request order (authenticated
+# users only)
+@router.get("/batch", response_model=schemas.TaskBatch)
+async def read_tasks_batch(
+    ids: List[int] = Depends(loaders.batch_ids),
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    request_loaders: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    tasks = await request_loaders.tasks(fields).load_many(ids)
+    return serialization.batch_response(ids, tasks)
+
+
+# Task counts by status for one user, or for all users when user_id is omitted
+@router.get("/stats", response_model=schemas.TaskStats)
+async def read_task_stats(
+    user_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    counts = await crud.get_task_stats(db, user_id=user_id)
+    return schemas.TaskStats(
+        user_id=user_id,
+        counts={status.value: count for status, count in counts.items()},
+        total=sum(counts.values()),
+    )
+
+
+# Server-Sent Events feed of the current user's task changes
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_task_events(
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    return crud.create_task(db=db, task=task, user_id=current_user.id)
+    # Dependencies are closed only after the response ends; release the
+    # connection used to authenticate instead of holding it for the stream
+    await db.close()
+    return StreamingResponse(
+        events.sse_chunks(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Tasks of the current user changed or deleted since a sync token. Reads the
+# primary: a lagging replica could hide changes older than the new token.
+@router.get("/changes", response_model=schemas.TaskChanges)
+async def read_task_changes(
+    since: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    return await sync.task_changes(db, current_user.id, since, limit)
+
+
+# Import tasks for the current user from an uploaded CSV or NDJSON file
+@router.post("/import", response_model=schemas.TaskImportSummary)
+async def import_tasks(
+    file: UploadFile,
+    import_format: Optional[schemas.TaskFileFormat] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    file_format = import_format or importer.format_for_filename(file.filename)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return await importer.import_tasks(
+            db, stream, file_format, user_id=current_user.id
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    finally:
+        stream.detach()
 
 
 # Get a list of all tasks (authenticated users only)
 @router.get("/", response_model=List[schemas.TaskResponse])
-def read_tasks(
+async def read_tasks(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    cursor: Optional[str] = None,
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    tasks = crud.get_tasks(db, skip=skip, limit=limit)
-    return tasks
+    after_id = pagination.decode_cursor(cursor, "id")["id"] if cursor else None
+    tasks = await crud.get_tasks(
+        db, skip=skip, limit=limit, after_id=after_id, fields=fields
+    )
+    pagination.add_next_link(request, response, pagination.next_cursor(tasks, limit))
+    return serialization.rows_response(tasks, response.headers)
 
 
 # Get tasks for a specific user (authenticated users only)
 @router.get("/user/{user_id}/", response_model=List[schemas.TaskResponse])
-def read_user_tasks(
+async def read_user_tasks(
+    request: Request,
+    response: Response,
     user_id: int,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    cursor: Optional[str] = None,
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    tasks = crud.get_user_tasks(db, user_id=user_id, skip=skip, limit=limit)
-    return tasks
+    after_id = None
+    if cursor:
+        key = pagination.decode_cursor(cursor, "user_id", "id")
+        if key["user_id"] != user_id:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after_id = key["id"]
+
+    cached, generation = await conditional.cached_response(
+        request, cache.user_tasks_tag(user_id)
+    )
+    if cached is not None:
+        return cached
+
+    tasks = await crud.get_user_tasks(
+        db, user_id=user_id, skip=skip, limit=limit, after_id=after_id, fields=fields
+    )
+    pagination.add_next_link(
+        request, response, pagination.next_cursor(tasks, limit, user_id=user_id)
+    )
+    content = [task._asdict() for task in tasks]
+    return await conditional.cache_response(
+        request, generation, content, response.headers
+    )
 
 
 # Get details of a specific task (authenticated users only)
 @router.get("/{task_id}/", response_model=schemas.TaskResponse)
-def read_task(
+async def read_task(
+    request: Request,
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    task = crud.get_task(db, task_id=task_id)
+    cached, generation = await conditional.cached_response(
+        request, cache.task_tag(task_id)
+    )
+    if cached is not None:
+        return cached
+
+    task = await crud.get_task(db, task_id=task_id, fields=fields)
     if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return await conditional.cache_response(request, generation, task._asdict())
+
+
+# Distinguish a missing task from someone else's after a write matched no rows
+async def _raise_task_write_error(db: AsyncSession, task_id: int):
+    if await crud.get_task_owner_id(db, task_id=task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    raise HTTPException(status_code=403, detail="Not enough permissions")
 
 
 # Update a specific task (task owner only)
 @router.put("/{task_id}/", response_model=schemas.TaskResponse)
-def update_task(
+async def update_task(
     task_id: int,
     task: schemas.TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    db_task = crud.get_task(db, task_id=task_id)
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if db_task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-
-    updated_task = crud.update_task(db=db, task_id=task_id, task=task)
+    updated_task = await crud.update_task(
+        db=db, task_id=task_id, task=task, user_id=current_user.id
+    )
+    if updated_task is None:
+        await _raise_task_write_error(db, task_id)
     return updated_task
 
 
 # Delete a specific task (task owner only)
 @router.delete("/{task_id}/", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(
+async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    db_task = crud.get_task(db, task_id=task_id)
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if db_task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-
-    crud.delete_task(db=db, task_id=task_id)
+    deleted_id = await crud.delete_task(db=db, task_id=task_id, user_id=current_user.id)
+    if deleted_id is None:
+        await _raise_task_write_error(db, task_id)
     return None
 
 
 # Mark a task as completed (task owner only)
 @router.patch("/{task_id}/complete/", response_model=schemas.TaskResponse)
-def complete_task(
+async def complete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    db_task = crud.get_task(db, task_id=task_id)
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    if db_task.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
-
-    completed_task = crud.mark_task_as_completed(db=db, task_id=task_id)
+    completed_task = await crud.mark_task_as_completed(
+        db=db, task_id=task_id, user_id=current_user.id
+    )
+    if completed_task is None:
+        await _raise_task_write_error(db, task_id)
     return completed_task
 
 
 # Filter tasks by status (authenticated users only)
 @router.get("/status/{status}/", response_model=List[schemas.TaskResponse])
-def filter_tasks_by_status(
+async def filter_tasks_by_status(
+    request: Request,
+    response: Response,
     status: schemas.TaskStatus,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    cursor: Optional[str] = None,
+    fields: Optional[Set[str]] = Depends(_task_fields),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    tasks = crud.filter_tasks_by_status(
-        db=db, status=status, user_id=None, skip=skip, limit=limit
+    after_id = pagination.decode_cursor(cursor, "id")["id"] if cursor else None
+    tasks = await crud.filter_tasks_by_status(
+        db=db,
+        status=status,
+        user_id=None,
+        skip=skip,
+        limit=limit,
+        after_id=after_id,
+        fields=fields,
     )
-    return tasks
+    pagination.add_next_link(request, response, pagination.next_cursor(tasks, limit))
+    return serialization.rows_response(tasks, response.headers)
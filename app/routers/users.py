@@ -1,32 +1,54 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, dependencies, models, schemas, security
-from app.database import get_db
+from app import (
+    crud,
+    dependencies,
+    loaders,
+    pagination,
+    ratelimit,
+    schemas,
+    security,
+    serialization,
+)
+from app.database import get_db, get_read_db
+from app.instrumentation import TimedRoute
 
 router = APIRouter(
     prefix="/users",
     tags=["users"],
+    route_class=TimedRoute,
 )
 
 
 # Register a new user
-@router.post("/register/", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+@router.post(
+    "/register/",
+    response_model=schemas.UserResponse,
+    dependencies=[Depends(ratelimit.limit_by_ip)],
+)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
 
 # Authenticate and get a JWT token
-@router.post("/login/", response_model=schemas.Token)
-def login_user(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
-    if not db_user or not security.verify_password(user.password, db_user.password):
+@router.post(
+    "/login/",
+    response_model=schemas.Token,
+    dependencies=[Depends(ratelimit.limit_by_ip)],
+)
+async def login_user(user: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    await ratelimit.limit_login(user.username)
+    db_user = await crud.get_user_by_username(db, username=user.username)
+    if not db_user or not await security.verify_password_async(
+        user.password, db_user.password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
     access_token = security.create_access_token(data={"sub": db_user.username})
@@ -34,13 +56,18 @@ def login_user(user: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 # Authenticate for FastAPI docs
-@router.post("/authorize-fastapi-docs/", response_model=schemas.Token)
-def authorize_fastapi_docs(
+@router.post(
+    "/authorize-fastapi-docs/",
+    response_model=schemas.Token,
+    dependencies=[Depends(ratelimit.limit_by_ip)],
+)
+async def authorize_fastapi_docs(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    db_user = crud.get_user_by_username(db, username=form_data.username)
-    if not db_user or not security.verify_password(
+    await ratelimit.limit_login(form_data.username)
+    db_user = await crud.get_user_by_username(db, username=form_data.username)
+    if not db_user or not await security.verify_password_async(
         form_data.password, db_user.password
     ):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
@@ -51,24 +78,41 @@ def authorize_fastapi_docs(
 
 # Get a list of all users (authenticated users only)
 @router.get("/", response_model=list[schemas.UserResponse])
-def read_users(
+async def read_users(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    users = crud.get_users(db, skip=skip, limit=limit)
+    after_id = pagination.decode_cursor(cursor, "id")["id"] if cursor else None
+    users = await crud.get_users(db, skip=skip, limit=limit, after_id=after_id)
+    pagination.add_next_link(request, response, pagination.next_cursor(users, limit))
     return users
 
 
+# Get several users by id with one query, in request order (authenticated
+# users only)
+@router.get("/batch", response_model=schemas.UserBatch)
+async def read_users_batch(
+    ids: List[int] = Depends(loaders.batch_ids),
+    request_loaders: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
+):
+    users = await request_loaders.users.load_many(ids)
+    return serialization.batch_response(ids, users)
+
+
 # Get details of a specific user (authenticated users only)
 @router.get("/{user_id}/", response_model=schemas.UserResponse)
-def read_user(
+async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(dependencies.get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.UserResponse = Depends(dependencies.get_current_user),
 ):
-    db_user = crud.get_user(db, user_id=user_id)
+    db_user = await crud.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
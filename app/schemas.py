@@ -1,5 +1,6 @@
+from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -29,6 +30,11 @@ class UserResponse(UserBase):
         orm_mode = True
 
 
+class UserBatch(BaseModel):
+    items: List[UserResponse]
+    missing: List[int]
+
+
 class UserLogin(BaseModel):
     username: str = Field(..., max_length=150, min_length=1)
     password: str = Field(..., min_length=6)
@@ -52,11 +58,59 @@ class TaskUpdate(TaskBase):
 class TaskResponse(TaskBase):
     id: int
     user_id: int
+    created_at: datetime
+    updated_at: datetime
 
     class Config:
         orm_mode = True
 
 
+class TaskBatch(BaseModel):
+    items: List[TaskResponse]
+    missing: List[int]
+
+
+class TaskStats(BaseModel):
+    user_id: Optional[int] = None
+    counts: Dict[TaskStatus, int]
+    total: int
+
+
+class TaskChanges(BaseModel):
+    changed: List[TaskResponse]
+    deleted: List[int]
+    next_token: str
+    has_more: bool
+
+
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+
+class TaskBulkResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status_code: int
+    detail: Optional[str] = None
+    task: Optional[TaskResponse] = None
+
+
+class TaskFileFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class TaskImportError(BaseModel):
+    line: int
+    detail: str
+
+
+class TaskImportSummary(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[TaskImportError]
+
+
 # JWT Token Model
 class Token(BaseModel):
     access_token: str
@@ -1,10 +1,16 @@
+import asyncio
+import multiprocessing
 import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from . import metrics
+
 load_dotenv()
 
 
@@ -12,6 +18,12 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1000
 
+# bcrypt runs in a dedicated pool: "process" (default) or "thread"
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -24,6 +36,118 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _timed_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+# Raised when the password hashing queue is full
+class PasswordHasherBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+# Bounded executor for CPU-bound password hashing. At most `max_pending` calls
+# may be queued or running; further calls are rejected with PasswordHasherBusy
+# instead of piling up behind bcrypt.
+class PasswordHasher:
+    def __init__(self, kind: str, workers: int, max_pending: int, retry_after: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_seconds = 0.0
+        self.run_seconds = 0.0
+        self._executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            else:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy(self.retry_after)
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, run_time = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, *args
+            )
+        finally:
+            self.pending -= 1
+
+        queue_time = max(time.perf_counter() - submitted - run_time, 0.0)
+        self.completed += 1
+        self.run_seconds += run_time
+        self.queue_seconds += queue_time
+        metrics.PASSWORD_HASH_QUEUE.observe(queue_time)
+        metrics.PASSWORD_HASH_RUN.observe(run_time)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_seconds_total": self.queue_seconds,
+            "run_seconds_total": self.run_seconds,
+        }
+
+    def collect_metrics(self):
+        return metrics.gauge_lines(
+            "password_hash_pending",
+            "Password hashing calls queued or running.",
+            self.pending,
+        ) + [
+            "# HELP password_hash_rejected_total Password hashing calls rejected "
+            "because the queue was full.",
+            "# TYPE password_hash_rejected_total counter",
+            f"password_hash_rejected_total {self.rejected}",
+        ]
+
+    def shutdown(self, wait: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_RETRY_AFTER,
+)
+metrics.register_collector(password_hasher.collect_metrics)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -0,0 +1,34 @@
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+
+# The bytes JSONResponse(jsonable_encoder(content)) renders, encoded by orjson.
+# Plain values such as rows of str, int, enum and datetime are encoded
+# directly; anything else (e.g. Pydantic models) goes through jsonable_encoder.
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=jsonable_encoder)
+
+
+# Response for content already shaped like the route's response_model, such
+# as rows of a column-only select. Returning it skips FastAPI's validation of
+# every item against the response_model, which stays the documented contract.
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# Rows of a column-only select as a JSON list of objects keyed by column name
+def rows_response(rows, headers=None) -> FastJSONResponse:
+    return FastJSONResponse([row._asdict() for row in rows], headers=headers)
+
+
+# Batch read result: the rows found, in the order of `ids`, and the ids that
+# were not found. `rows` holds one row or None per id.
+def batch_response(ids, rows) -> FastJSONResponse:
+    return FastJSONResponse(
+        {
+            "items": [row._asdict() for row in rows if row is not None],
+            "missing": [id_ for id_, row in zip(ids, rows) if row is None],
+        }
+    )
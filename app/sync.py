@@ -0,0 +1,94 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, pagination, schemas
+from .models import utcnow
+
+# Tombstones are purged after this many days; older sync tokens are rejected
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+
+Position = Tuple[int, int]
+
+
+# A sync token holds the last (change version, id) positions delivered from
+# the tasks and from the tombstones, and the time up to which tombstones were
+# delivered, which tells when the token expires
+def encode_token(tasks: Position, tombstones: Position, synced_at: datetime) -> str:
+    return pagination.encode_cursor(
+        t=list(tasks), d=list(tombstones), at=synced_at.isoformat()
+    )
+
+
+def decode_token(token: str) -> Tuple[Position, Position, datetime]:
+    key = pagination.decode_cursor(token)
+    if "t" in key and "at" not in key:
+        # Tokens from before change versions hold timestamps
+        raise HTTPException(
+            status_code=410, detail="Sync token expired, fetch all tasks again"
+        )
+    try:
+        positions = []
+        for field in ("t", "d"):
+            version, row_id = key[field]
+            if not isinstance(version, int) or not isinstance(row_id, int):
+                raise ValueError
+            positions.append((version, row_id))
+        synced_at = datetime.fromisoformat(key["at"])
+        if synced_at.tzinfo is None:
+            raise ValueError
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return positions[0], positions[1], synced_at
+
+
+# Tasks of user_id changed or deleted since `token` (everything when None),
+# at most `limit` of each per call. Only changes below the change horizon are
+# read, so a write that commits later, however long its transaction ran, is
+# delivered by a later call.
+async def task_changes(
+    db: AsyncSession, user_id: int, token: Optional[str], limit: int
+) -> schemas.TaskChanges:
+    now = utcnow()
+    until = await crud.get_change_horizon(db)
+    if token:
+        after_task, after_tombstone, synced_at = decode_token(token)
+        if synced_at < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+            raise HTTPException(
+                status_code=410, detail="Sync token expired, fetch all tasks again"
+            )
+    else:
+        # A client without a token has no tasks to delete
+        after_task, after_tombstone = None, (until, 0)
+
+    tasks = await crud.get_task_changes(db, user_id, after_task, until, limit)
+    tombstones = await crud.get_task_tombstones(
+        db, user_id, after_tombstone, until, limit
+    )
+
+    # Once everything below `until` is delivered, move both positions there
+    drained = (until, 0)
+    task_position = (tasks[-1].change_version, tasks[-1].id) if tasks else after_task
+    if len(tasks) < limit:
+        task_position = max(task_position or drained, drained)
+    if len(tombstones) < limit:
+        tombstone_position = max(after_tombstone, drained)
+        synced_at = now
+    else:
+        tombstone_position = (tombstones[-1].change_version, tombstones[-1].id)
+        synced_at = tombstones[-1].deleted_at
+
+    return schemas.TaskChanges(
+        changed=tasks,
+        deleted=[tombstone.task_id for tombstone in tombstones],
+        next_token=encode_token(task_position, tombstone_position, synced_at),
+        has_more=len(tasks) == limit or len(tombstones) == limit,
+    )
+
+
+# Delete tombstones past the retention period; returns how many were removed
+async def purge_tombstones(db: AsyncSession, days: float = TOMBSTONE_RETENTION_DAYS):
+    return await crud.purge_task_tombstones(db, utcnow() - timedelta(days=days))
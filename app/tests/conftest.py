@@ -1,9 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app.database import Base, get_db
+from app import ratelimit, security
+from app.cache import LRUCache, principal_cache, response_cache
+from app.database import Base, get_db, get_read_db
+from app.instrumentation import instrument_engine
 from app.main import app
 
 # Database for tests
@@ -12,8 +17,23 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
-# Create a session maker for the test database
+# The app talks to the same database through the async driver. TestClient runs
+# each request on its own event loop, so connections must not be pooled.
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+instrument_engine(async_engine)
+
+# Create session makers for the test database
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncTestingSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+# Stop password hashing workers once the test session is over
+@pytest.fixture(scope="session", autouse=True)
+def password_hasher():
+    yield security.password_hasher
+    security.password_hasher.shutdown(wait=True)
 
 
 # Fixture for the test database
@@ -31,12 +51,16 @@ def db():
 # Fixture for the FastAPI test client
 @pytest.fixture(scope="function")
 def client(db):
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            db.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as async_db:
+            yield async_db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     yield TestClient(app)
     app.dependency_overrides.clear()
+    principal_cache.backend = LRUCache(principal_cache.backend.maxsize)
+    response_cache.backend = LRUCache(response_cache.backend.maxsize)
+    ratelimit.rate_limiter.backend = ratelimit.MemoryRateLimitBackend(
+        ratelimit.RATE_LIMIT_STORE_SIZE
+    )
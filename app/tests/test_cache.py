@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.cache import LRUCache, PrincipalCache
+
+
+@pytest.mark.asyncio
+async def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    await cache.set("a", 1, ttl=60)
+    await cache.set("b", 2, ttl=60)
+    assert await cache.get("a") == 1
+
+    await cache.set("c", 3, ttl=60)
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_lru_cache_expires_entries():
+    now = 0.0
+    cache = LRUCache(maxsize=2, clock=lambda: now)
+    await cache.set("a", 1, ttl=10)
+    now = 9.9
+    assert await cache.get("a") == 1
+    now = 10
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidate_user():
+    cache = PrincipalCache(LRUCache(maxsize=10), ttl=60)
+    payload = {"sub": "testuser", "exp": time.time() + 60}
+    await cache.set("token", payload, {"id": 1, "username": "testuser"})
+    assert (await cache.get("token"))["user"]["id"] == 1
+
+    await cache.invalidate_user("testuser")
+    assert await cache.get("token") is None
+
+
+def test_get_current_user_is_cached(client: TestClient, db: Session, mocker):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    lookup = mocker.spy(crud, "get_user_by_username")
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    assert lookup.call_count == 1
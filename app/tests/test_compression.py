@@ -0,0 +1,148 @@
+import asyncio
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.compression import CompressionMiddleware, negotiate
+
+
+def _decoder(encoding: str):
+    if encoding == "br":
+        brotli = pytest.importorskip("brotli")
+        return brotli.Decompressor().process
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+
+
+# Run `app` behind the middleware and return the ASGI messages it sends
+def _messages(app, accept_encoding: str, **options):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    middleware = CompressionMiddleware(app, **options)
+    asyncio.run(middleware(scope, receive, send))
+    return messages
+
+
+def _streaming_app(media_type: str, chunks):
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", media_type.encode())],
+            }
+        )
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    return app
+
+
+def test_negotiate():
+    encodings = ["br", "zstd", "gzip"]
+    assert negotiate("gzip, deflate, br", encodings) == "br"
+    assert negotiate("gzip, br;q=0.5", encodings) == "gzip"
+    assert negotiate("br;q=0, gzip", encodings) == "gzip"
+    assert negotiate("*", encodings) == "br"
+    assert negotiate("identity", encodings) is None
+    assert negotiate("", encodings) is None
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_streamed_chunks_are_sent_without_buffering(encoding):
+    decode = _decoder(encoding)
+    chunks = [b'{"id":%d,"title":"Task"}\n' % i * 20 for i in range(5)]
+    messages = _messages(
+        _streaming_app("application/x-ndjson", chunks), encoding, encodings=[encoding]
+    )
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == encoding.encode()
+    assert b"content-length" not in headers
+    # Every chunk can be decoded as soon as its message is sent
+    decoded = b""
+    for index, message in enumerate(messages[1:-1]):
+        decoded += decode(message["body"])
+        assert decoded == b"".join(chunks[: index + 1])
+
+
+def test_event_streams_are_not_compressed():
+    chunks = [b"event: created\ndata: {}\n\n" * 50]
+    messages = _messages(_streaming_app("text/event-stream", chunks), "gzip")
+    assert b"content-encoding" not in dict(messages[0]["headers"])
+    assert messages[1]["body"] == chunks[0]
+
+
+def test_compressed_task_responses(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    created = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Task {i}", "status": "New"} for i in range(20)],
+    ).json()
+    user_id = created[0]["task"]["user_id"]
+
+    url = f"/tasks/user/{user_id}/?limit=20"
+    plain = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    response = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(plain.content)
+    assert response.content == plain.content
+    # Compression makes the ETag weak; it still validates the cached copy
+    assert response.headers["etag"] == "W/" + plain.headers["etag"]
+    response = client.get(
+        url,
+        headers={
+            **headers,
+            "Accept-Encoding": "gzip",
+            "If-None-Match": response.headers["etag"],
+        },
+    )
+    assert response.status_code == 304
+
+    # Below the minimum size
+    response = client.get(
+        f"/tasks/{created[0]['id']}/", headers={**headers, "Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in response.headers
+
+    response = client.get(
+        "/tasks/export", headers={**headers, "Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 20
@@ -0,0 +1,100 @@
+import asyncio
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app import database
+from app.database import (
+    PRIMARY_STICKY_COOKIE,
+    ReplicaSet,
+    async_database_url,
+    engine_options,
+    get_read_db,
+)
+from app.tests.conftest import async_engine
+
+
+def test_engine_options_configure_pool(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 3)
+    monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 7)
+    monkeypatch.setattr(database, "DB_POOL_PRE_PING", True)
+    monkeypatch.setattr(database, "DB_STATEMENT_CACHE_SIZE", 250)
+
+    options = engine_options(async_database_url("postgresql://u:p@db/app"))
+    assert "poolclass" not in options
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 7
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"prepared_statement_cache_size": 250}
+
+
+def test_engine_options_external_pooler(monkeypatch):
+    monkeypatch.setattr(database, "DB_EXTERNAL_POOLER", True)
+
+    options = engine_options(async_database_url("postgresql://u:p@db/app"))
+    assert options["poolclass"] is NullPool
+    assert "pool_size" not in options
+    assert options["connect_args"]["statement_cache_size"] == 0
+    assert options["connect_args"]["prepared_statement_cache_size"] == 0
+
+
+def test_engine_options_in_memory_sqlite_keeps_dialect_pool():
+    options = engine_options(async_database_url("sqlite://"))
+    assert "poolclass" not in options
+    assert "connect_args" not in options
+
+
+def test_engine_options_sqlite_file_pooling(monkeypatch):
+    options = engine_options(async_database_url("sqlite:///./app.db"))
+    assert "poolclass" not in options
+    assert "pool_size" not in options
+
+    monkeypatch.setattr(database, "DB_POOL_SQLITE", True)
+    options = engine_options(async_database_url("sqlite:///./app.db"))
+    assert options["poolclass"] is AsyncAdaptedQueuePool
+    assert options["pool_size"] == database.DB_POOL_SIZE
+    assert "poolclass" not in engine_options(async_database_url("sqlite://"))
+
+
+def _request(cookies: str = ""):
+    headers = [(b"cookie", cookies.encode())] if cookies else []
+    return Request({"type": "http", "headers": headers})
+
+
+async def _read_db_url(request: Request):
+    async for db in get_read_db(request):
+        return str(db.bind.url)
+
+
+def test_get_read_db_skips_unavailable_replica(monkeypatch):
+    replicas = ReplicaSet(
+        ["sqlite:///./missing/replica.db", "sqlite:///./test.db"], retry_after=30
+    )
+    monkeypatch.setattr(database, "replicas", replicas)
+
+    assert asyncio.run(_read_db_url(_request())) == "sqlite+aiosqlite:///./test.db"
+    assert replicas.candidates() == [1]
+    asyncio.run(replicas.dispose())
+
+
+def test_get_read_db_sticks_to_primary_after_write(monkeypatch, client: TestClient):
+    monkeypatch.setattr(
+        database, "replicas", ReplicaSet(["sqlite:///./replica.db"], retry_after=30)
+    )
+    monkeypatch.setattr(database, "_engine", async_engine)
+
+    response = client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    assert response.cookies[PRIMARY_STICKY_COOKIE] == "1"
+    assert PRIMARY_STICKY_COOKIE not in client.get("/users/").cookies
+
+    request = _request(f"{PRIMARY_STICKY_COOKIE}=1")
+    assert asyncio.run(_read_db_url(request)) == "sqlite+aiosqlite:///./test.db"
@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, events, models, schemas
+from app.events import EventBus, LocalEventBackend
+from app.tests.conftest import AsyncTestingSessionLocal
+
+
+def _drain(subscriber):
+    items = []
+    while not subscriber.queue.empty():
+        items.append(subscriber.queue.get_nowait())
+    return items
+
+
+@pytest.mark.asyncio
+async def test_event_bus_evicts_slow_consumer():
+    bus = EventBus(LocalEventBackend(), queue_size=2)
+    slow = bus.subscribe(user_id=1)
+    other = bus.subscribe(user_id=2)
+
+    await bus.publish([{"type": "deleted", "user_id": 1, "data": {"id": 1}}] * 2)
+    assert slow.queue.qsize() == 2
+    assert other.queue.empty()
+
+    await bus.publish([{"type": "deleted", "user_id": 1, "data": {"id": 3}}])
+    assert _drain(slow) == [None]
+    assert bus.subscriber_count() == 1
+
+
+@pytest.mark.asyncio
+async def test_crud_publishes_task_events(db: Session):
+    user = models.User(username="testuser", first_name="Test", password="x")
+    db.add(user)
+    db.commit()
+
+    subscriber = events.event_bus.subscribe(user.id)
+    try:
+        async with AsyncTestingSessionLocal() as session:
+            task = await crud.create_task(
+                session, schemas.TaskCreate(title="Task", status="New"), user.id
+            )
+            await crud.mark_task_as_completed(session, task.id, user.id)
+            await crud.delete_task(session, task.id, user.id)
+    finally:
+        events.event_bus.unsubscribe(subscriber)
+
+    published = _drain(subscriber)
+    assert [event["type"] for event in published] == [
+        "created",
+        "completed",
+        "deleted",
+    ]
+    assert published[1]["data"]["status"] == "Completed"
+    assert published[2]["data"] == {"id": task.id}
+
+
+@pytest.mark.asyncio
+async def test_sse_chunks(monkeypatch):
+    monkeypatch.setattr(events, "EVENT_KEEPALIVE_SECONDS", 0.01)
+    monkeypatch.setattr(events.event_bus, "queue_size", 1)
+    stream = events.sse_chunks(user_id=1)
+    assert await stream.__anext__() == ": connected\n\n"
+    assert await stream.__anext__() == ": keepalive\n\n"
+
+    await events.publish_deleted(1, [5])
+    assert await stream.__anext__() == 'event: deleted\ndata: {"id":5}\n\n'
+
+    await events.publish_deleted(1, [6, 7])
+    assert await stream.__anext__() == "event: evicted\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert events.event_bus.subscriber_count() == 0
+
+
+def test_stream_task_events_unauthenticated(client: TestClient):
+    response = client.get("/tasks/stream")
+    assert response.status_code == 401
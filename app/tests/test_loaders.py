@@ -0,0 +1,19 @@
+import pytest
+
+from app.loaders import Loader
+
+
+@pytest.mark.asyncio
+async def test_loader_fetches_each_id_once():
+    calls = []
+
+    async def fetch(ids):
+        calls.append(ids)
+        return {id_: f"row {id_}" for id_ in ids if id_ != 3}
+
+    loader = Loader(fetch)
+    assert await loader.load_many([2, 3, 1, 2]) == ["row 2", None, "row 1", "row 2"]
+    assert await loader.load(1) == "row 1"
+    assert await loader.load(3) is None
+    assert await loader.load_many([4, 2]) == ["row 4", "row 2"]
+    assert calls == [[2, 3, 1], [4]]
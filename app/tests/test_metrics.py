@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import database, metrics
+from app.database import ReplicaSet
+from app.metrics import Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1))
+    child = histogram.labels("/tasks/")
+    child.observe(0.05)
+    child.observe(0.5)
+    child.observe(5)
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/tasks/",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/tasks/",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/tasks/",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{route="/tasks/"} 3' in lines
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_per_engine(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "_engines", {})
+    monkeypatch.setattr(database, "DB_POOL_SQLITE", True)
+    replicas = ReplicaSet(
+        [f"sqlite:///{tmp_path}/replica-{index}.db" for index in range(2)],
+        retry_after=30,
+    )
+    histograms = (metrics.POOL_CHECKOUT_WAIT, metrics.POOL_CONNECTION_HELD)
+    names = ("replica-0", "replica-1")
+    before = [h.labels(name).count for h in histograms for name in names]
+    try:
+        async with replicas.engine(0).connect() as connection:
+            await connection.execute(text("SELECT 1"))
+            lines = metrics.render().splitlines()
+            assert 'db_pool_checked_out{engine="replica-0"} 1' in lines
+        # Pools created by dispose() stay instrumented
+        await replicas.engine(1).dispose()
+        async with replicas.engine(1).connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    finally:
+        await replicas.dispose()
+
+    lines = metrics.render().splitlines()
+    assert 'db_pool_checked_out{engine="replica-0"} 0' in lines
+    assert 'db_pool_size{engine="replica-1"} 10' in lines
+    after = [h.labels(name).count for h in histograms for name in names]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 1, 1]
+
+
+def test_metrics_endpoint(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert (
+        'http_request_duration_seconds_count{method="POST",route="/users/login/"}'
+        in body
+    )
+    assert 'http_requests_in_progress{method="POST",route="/users/login/"} 0' in body
+    assert "password_hash_queue_seconds_count" in body
+    assert "password_hash_pending 0" in body
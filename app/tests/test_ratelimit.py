@@ -0,0 +1,160 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import crud, ratelimit, security
+from app.ratelimit import MemoryRateLimitBackend
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_refills_tokens():
+    now = 0.0
+    backend = MemoryRateLimitBackend(maxsize=10, clock=lambda: now)
+    assert await backend.take("a", 2, 60) == 0
+    assert await backend.take("a", 2, 60) == 0
+    assert await backend.take("a", 2, 60) == pytest.approx(30)
+    assert await backend.take("b", 2, 60) == 0
+
+    now = 20.0
+    assert await backend.take("a", 2, 60) == pytest.approx(10)
+    now = 30.0
+    assert await backend.take("a", 2, 60) == 0
+
+
+@pytest.mark.parametrize("value", ["0/60", "10/0", "10/-1", "abc", "10", "10/inf"])
+def test_invalid_rate_settings_are_rejected(monkeypatch, value):
+    monkeypatch.setenv("TASKS_RATE_LIMIT_PER_PRINCIPAL", value)
+    with pytest.raises(RuntimeError, match="TASKS_RATE_LIMIT_PER_PRINCIPAL"):
+        ratelimit._getenv_rate("TASKS_RATE_LIMIT_PER_PRINCIPAL", "600/60")
+
+
+def test_rate_settings(monkeypatch):
+    monkeypatch.setenv("TASKS_RATE_LIMIT_PER_PRINCIPAL", " 5/1.5 ")
+    assert ratelimit._getenv_rate("TASKS_RATE_LIMIT_PER_PRINCIPAL", "") == (5, 1.5)
+    monkeypatch.setenv("TASKS_RATE_LIMIT_PER_PRINCIPAL", "")
+    assert ratelimit._getenv_rate("TASKS_RATE_LIMIT_PER_PRINCIPAL", "600/60") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_is_bounded():
+    backend = MemoryRateLimitBackend(maxsize=2)
+    for key in ("a", "b", "c"):
+        await backend.take(key, 1, 60)
+    assert len(backend) == 2
+    # The evicted bucket starts full again
+    assert await backend.take("a", 1, 60) == 0
+    assert await backend.take("c", 1, 60) > 0
+
+
+def test_login_is_limited_per_username(
+    client: TestClient, db: Session, monkeypatch, mocker
+):
+    monkeypatch.setattr(ratelimit, "LOGIN_RATE_LIMIT_PER_USERNAME", (2, 60))
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    for _ in range(2):
+        response = client.post(
+            "/users/login/",
+            json={"username": "testuser", "password": "wrongpassword"},
+        )
+        assert response.status_code == 400
+
+    verify_password = mocker.spy(security, "verify_password_async")
+    response = client.post(
+        "/users/login/",
+        json={"username": "TestUser", "password": "password123"},
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    response = client.post(
+        "/users/authorize-fastapi-docs/",
+        data={"username": "testuser", "password": "password123"},
+    )
+    assert response.status_code == 429
+    verify_password.assert_not_called()
+
+    # Other usernames are unaffected
+    response = client.post(
+        "/users/login/",
+        json={"username": "otheruser", "password": "password123"},
+    )
+    assert response.status_code == 400
+
+
+def test_unauthenticated_user_routes_are_limited_per_ip(
+    client: TestClient, db: Session, monkeypatch, mocker
+):
+    monkeypatch.setattr(ratelimit, "USERS_RATE_LIMIT_PER_IP", (3, 60))
+    for _ in range(3):
+        response = client.post(
+            "/users/login/",
+            json={"username": "testuser", "password": "password123"},
+        )
+        assert response.status_code == 400
+
+    response = client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "20"
+    get_user = mocker.spy(crud, "get_user_by_username")
+    response = client.post(
+        "/users/authorize-fastapi-docs/",
+        data={"username": "testuser", "password": "password123"},
+    )
+    assert response.status_code == 429
+    get_user.assert_not_called()
+
+    # Authenticated routes are not limited per IP
+    assert client.get("/users/batch?ids=1").status_code == 401
+
+
+def test_task_routes_are_limited_per_principal(
+    client: TestClient, db: Session, monkeypatch, mocker
+):
+    monkeypatch.setattr(ratelimit, "TASKS_RATE_LIMIT_PER_PRINCIPAL", (2, 60))
+    tokens = []
+    for username in ("testuser", "otheruser"):
+        client.post(
+            "/users/register/",
+            json={
+                "username": username,
+                "password": "password123",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+        login_response = client.post(
+            "/users/login/",
+            json={"username": username, "password": "password123"},
+        )
+        tokens.append(login_response.json()["access_token"])
+    headers = {"Authorization": f"Bearer {tokens[0]}"}
+
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    # Once the principal is cached, the token is not decoded again
+    decode_access_token = mocker.spy(security, "decode_access_token")
+    assert client.get("/tasks/", headers=headers).status_code == 200
+    response = client.get("/tasks/", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+    decode_access_token.assert_not_called()
+
+    other_headers = {"Authorization": f"Bearer {tokens[1]}"}
+    assert client.get("/tasks/", headers=other_headers).status_code == 200
+    # Invalid tokens are rejected by authentication, not counted
+    invalid_headers = {"Authorization": "Bearer invalid"}
+    assert client.get("/tasks/", headers=invalid_headers).status_code == 401
@@ -1,6 +1,26 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import logging
+import shutil
+from typing import List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
+from pydantic import parse_obj_as
+from sqlalchemy import event, select, text
 from sqlalchemy.orm import Session
 
+from app import crud, database, importer, instrumentation, models, schemas, sync
+from app.cache import LRUCache, response_cache
+from app.main import app
+from app.routers import tasks as tasks_router
+from app.tests.conftest import AsyncTestingSessionLocal, async_engine
+
 
 def test_create_task(client: TestClient, db: Session):
     client.post(
@@ -201,3 +221,1013 @@ def test_update_task_by_another_user(client: TestClient, db: Session):
         },
     )
     assert update_response.status_code == 403
+
+
+def test_read_tasks_cursor_pagination(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(5):
+        client.post(
+            "/tasks/", headers=headers, json={"title": f"Task {i}", "status": "New"}
+        )
+
+    first_page = client.get("/tasks/?limit=2", headers=headers)
+    assert first_page.status_code == 200
+    assert [t["title"] for t in first_page.json()] == ["Task 0", "Task 1"]
+    assert 'rel="next"' in first_page.headers["Link"]
+
+    cursor = first_page.headers["X-Next-Cursor"]
+    second_page = client.get(f"/tasks/?limit=2&cursor={cursor}", headers=headers)
+    assert [t["title"] for t in second_page.json()] == ["Task 2", "Task 3"]
+
+    cursor = second_page.headers["X-Next-Cursor"]
+    last_page = client.get(f"/tasks/?limit=2&cursor={cursor}", headers=headers)
+    assert [t["title"] for t in last_page.json()] == ["Task 4"]
+    assert "Link" not in last_page.headers
+
+
+def test_read_user_tasks_rejects_foreign_cursor(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for i in range(2):
+        client.post(
+            "/tasks/", headers=headers, json={"title": f"Task {i}", "status": "New"}
+        )
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    page = client.get(f"/tasks/user/{user_id}/?limit=1", headers=headers)
+    cursor = page.headers["X-Next-Cursor"]
+
+    response = client.get(
+        f"/tasks/user/{user_id + 1}/?cursor={cursor}", headers=headers
+    )
+    assert response.status_code == 400
+
+    response = client.get("/tasks/?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+
+def test_complete_task_runs_single_statement(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    create_response = client.post(
+        "/tasks/", headers=headers, json={"title": "Task", "status": "New"}
+    )
+    task_id = create_response.json()["id"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "tasks" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.patch(f"/tasks/{task_id}/complete/", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "Completed"
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE tasks")
+
+
+def test_write_missing_or_foreign_task(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "user1",
+            "password": "password123",
+            "first_name": "User",
+            "last_name": "One",
+        },
+    )
+    login_response = client.post(
+        "/users/login/", json={"username": "user1", "password": "password123"}
+    )
+    owner_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    task_id = client.post(
+        "/tasks/", headers=owner_headers, json={"title": "Task", "status": "New"}
+    ).json()["id"]
+
+    client.post(
+        "/users/register/",
+        json={
+            "username": "user2",
+            "password": "password12345",
+            "first_name": "User",
+            "last_name": "Two",
+        },
+    )
+    login_response = client.post(
+        "/users/login/", json={"username": "user2", "password": "password12345"}
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    assert client.delete(f"/tasks/{task_id}/", headers=headers).status_code == 403
+    assert (
+        client.patch(f"/tasks/{task_id}/complete/", headers=headers).status_code == 403
+    )
+    assert client.delete(f"/tasks/{task_id + 1}/", headers=headers).status_code == 404
+    assert (
+        client.get(f"/tasks/{task_id}/", headers=owner_headers).json()["status"]
+        == "New"
+    )
+
+
+def test_bulk_task_endpoints(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    create_response = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Task {i}", "status": "New"} for i in range(3)],
+    )
+    assert create_response.status_code == 200
+    created = create_response.json()
+    assert [item["task"]["title"] for item in created] == ["Task 0", "Task 1", "Task 2"]
+    ids = [item["id"] for item in created]
+
+    update_response = client.patch(
+        "/tasks/bulk",
+        headers=headers,
+        json=[
+            {"id": ids[0], "title": "Renamed", "status": "In Progress"},
+            {"id": ids[-1] + 100, "title": "Missing", "status": "New"},
+        ],
+    )
+    updated = update_response.json()
+    assert updated[0]["task"]["title"] == "Renamed"
+    assert updated[0]["task"]["status"] == "In Progress"
+    assert updated[1]["status_code"] == 404
+
+    complete_response = client.patch(
+        "/tasks/bulk/complete", headers=headers, json=[ids[1], ids[2]]
+    )
+    assert [item["task"]["status"] for item in complete_response.json()] == [
+        "Completed",
+        "Completed",
+    ]
+
+    delete_response = client.request(
+        "DELETE", "/tasks/bulk", headers=headers, json=[ids[0], ids[1]]
+    )
+    assert [item["status_code"] for item in delete_response.json()] == [200, 200]
+    assert len(client.get("/tasks/", headers=headers).json()) == 1
+
+
+def test_bulk_task_batch_size_limit(client: TestClient, db: Session, monkeypatch):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    monkeypatch.setattr(tasks_router, "TASKS_BULK_MAX_ITEMS", 2)
+    response = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Task {i}", "status": "New"} for i in range(3)],
+    )
+    assert response.status_code == 413
+
+
+def test_list_queries_use_indexes(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM tasks" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        client.get(f"/tasks/user/{user_id}/", headers=headers)
+        client.get("/tasks/status/New/", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    plans = [
+        " ".join(
+            row[-1]
+            for row in db.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            )
+        )
+        for statement, parameters in statements
+    ]
+    assert len(plans) == 2
+    assert "USING INDEX ix_tasks_user_id_id" in plans[0]
+    assert "USING INDEX ix_tasks_status_id" in plans[1]
+
+
+def test_export_tasks(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[
+            {"title": "Task 1", "description": "First, with comma", "status": "New"},
+            {"title": "Task 2", "status": "In Progress"},
+        ],
+    )
+    tasks = client.get("/tasks/", headers=headers).json()
+
+    response = client.get("/tasks/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == tasks
+
+    response = client.get("/tasks/export?format=csv", headers=headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Task 1", "Task 2"]
+    assert rows[0]["description"] == "First, with comma"
+    assert rows[1]["status"] == "In Progress"
+
+
+def test_import_tasks(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    csv_file = (
+        "title,description,status\n"
+        "Task 1,,New\n"
+        "Task 2,Desc,Bogus\n"
+        "Task 3,Desc,Completed\n"
+    )
+    response = client.post(
+        "/tasks/import",
+        headers=headers,
+        files={"file": ("tasks.csv", csv_file, "text/csv")},
+    )
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["accepted"] == 2
+    assert summary["rejected"] == 1
+    assert summary["errors"][0]["line"] == 3
+
+    ndjson_file = '{"title": "Task 4", "status": "In Progress"}\nnot json\n'
+    response = client.post(
+        "/tasks/import",
+        headers=headers,
+        files={"file": ("tasks.ndjson", ndjson_file, "application/x-ndjson")},
+    )
+    summary = response.json()
+    assert (summary["accepted"], summary["rejected"]) == (1, 1)
+
+    tasks = client.get("/tasks/", headers=headers).json()
+    assert [(t["title"], t["status"]) for t in tasks] == [
+        ("Task 1", "New"),
+        ("Task 3", "Completed"),
+        ("Task 4", "In Progress"),
+    ]
+    assert tasks[0]["description"] is None
+
+
+def test_import_tasks_is_one_transaction(client: TestClient, db: Session, monkeypatch):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    load_records = importer._load_records
+    loaded = []
+
+    async def load_records_failing_second_chunk(session, records):
+        loaded.append(records)
+        if len(loaded) == 2:
+            raise RuntimeError("Chunk failed")
+        await load_records(session, records)
+
+    monkeypatch.setattr(importer, "_load_records", load_records_failing_second_chunk)
+
+    async def run_import():
+        stream = io.StringIO(
+            '{"title": "Task 1", "status": "New"}\n'
+            '{"title": "Task 2", "status": "New"}\n'
+        )
+        async with AsyncTestingSessionLocal() as session:
+            with pytest.raises(RuntimeError):
+                await importer.import_tasks(
+                    session,
+                    stream,
+                    schemas.TaskFileFormat.ndjson,
+                    user_id=user_id,
+                    chunk_size=1,
+                )
+
+    asyncio.run(run_import())
+    assert len(loaded) == 2
+    # The first chunk was rolled back with the failing one
+    assert client.get("/tasks/", headers=headers).json() == []
+
+
+def test_server_timing_header(client: TestClient, db: Session, caplog):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with caplog.at_level(logging.INFO, logger="app.performance"):
+        response = client.get("/tasks/", headers=headers)
+
+    phases = {
+        entry.split(";")[0]: entry
+        for entry in response.headers["Server-Timing"].split(", ")
+    }
+    assert {"auth", "user", "db", "endpoint", "serialize", "total"} <= set(phases)
+    assert 'desc="2 queries"' in phases["db"]
+
+    record = caplog.records[-1]
+    assert record.path == "/tasks/"
+    assert record.query_count == 2
+
+
+def test_query_count_warning(client: TestClient, db: Session, caplog, monkeypatch):
+    monkeypatch.setattr(instrumentation, "QUERY_COUNT_WARN_THRESHOLD", 1)
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with caplog.at_level(logging.WARNING, logger="app.performance"):
+        client.get("/tasks/", headers=headers)
+    assert "GET /tasks/ ran 2 SQL statements" in caplog.text
+
+
+def test_read_task_etag(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post(
+        "/tasks/", headers=headers, json={"title": "Test Task", "status": "New"}
+    ).json()["id"]
+
+    response = client.get(f"/tasks/{task_id}/", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Test Task"
+    etag = response.headers["ETag"]
+
+    response = client.get(
+        f"/tasks/{task_id}/", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.put(
+        f"/tasks/{task_id}/",
+        headers=headers,
+        json={"title": "Renamed", "status": "New"},
+    )
+    response = client.get(
+        f"/tasks/{task_id}/", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_response_cache_skips_database(client: TestClient, db: Session, monkeypatch):
+    monkeypatch.setattr(response_cache, "backend", LRUCache(100))
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+    for title in ("First", "Second"):
+        client.post("/tasks/", headers=headers, json={"title": title, "status": "New"})
+
+    url = f"/tasks/user/{user_id}/?limit=1"
+    first = client.get(url, headers=headers)
+    second = client.get(url, headers=headers)
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert "db;" not in second.headers["Server-Timing"]
+
+    task_id = first.json()[0]["id"]
+    client.patch(f"/tasks/{task_id}/complete/", headers=headers)
+    third = client.get(url, headers=headers)
+    assert third.json()[0]["status"] == "Completed"
+    assert "db;" in third.headers["Server-Timing"]
+
+
+def test_response_cache_skips_replica_reads(
+    client: TestClient, db: Session, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(response_cache, "backend", LRUCache(100))
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    task_id = client.post(
+        "/tasks/", headers=headers, json={"title": "First", "status": "New"}
+    ).json()["id"]
+
+    # A replica that stopped replicating before the write below
+    shutil.copy("test.db", tmp_path / "replica.db")
+    replicas = database.ReplicaSet([f"sqlite:///{tmp_path}/replica.db"], 30)
+    monkeypatch.setattr(database, "replicas", replicas)
+    monkeypatch.setattr(database, "_engine", async_engine)
+    monkeypatch.delitem(app.dependency_overrides, database.get_read_db)
+    try:
+        response = client.patch(f"/tasks/{task_id}/complete/", headers=headers)
+        sticky_cookie = response.cookies[database.PRIMARY_STICKY_COOKIE]
+        client.cookies.clear()
+
+        url = f"/tasks/{task_id}/"
+        assert client.get(url, headers=headers).json()["status"] == "New"
+        assert client.get(url, headers=headers).json()["status"] == "New"
+        assert len(response_cache.backend) == 0
+
+        client.cookies.set(database.PRIMARY_STICKY_COOKIE, sticky_cookie)
+        first = client.get(url, headers=headers)
+        assert first.json()["status"] == "Completed"
+        second = client.get(url, headers=headers)
+        assert second.json()["status"] == "Completed"
+        assert "db;" not in second.headers["Server-Timing"]
+    finally:
+        asyncio.run(replicas.dispose())
+
+
+def test_task_changes(client: TestClient, db: Session, monkeypatch):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = [
+        client.post(
+            "/tasks/", headers=headers, json={"title": title, "status": "New"}
+        ).json()["id"]
+        for title in ("Task 1", "Task 2", "Task 3")
+    ]
+
+    first_page = client.get("/tasks/changes?limit=2", headers=headers).json()
+    assert [task["id"] for task in first_page["changed"]] == ids[:2]
+    assert first_page["has_more"] is True
+    second_page = client.get(
+        f"/tasks/changes?limit=2&since={first_page['next_token']}", headers=headers
+    ).json()
+    assert [task["id"] for task in second_page["changed"]] == ids[2:]
+    assert second_page["deleted"] == []
+    assert second_page["has_more"] is False
+    sync_token = second_page["next_token"]
+
+    response = client.get(f"/tasks/changes?since={sync_token}", headers=headers)
+    assert response.json()["changed"] == []
+
+    client.patch(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"id": ids[0], "title": "Renamed", "status": "New"}],
+    )
+    client.delete(f"/tasks/{ids[1]}/", headers=headers)
+
+    changes = client.get(f"/tasks/changes?since={sync_token}", headers=headers).json()
+    assert [task["title"] for task in changes["changed"]] == ["Renamed"]
+    assert changes["changed"][0]["updated_at"] > changes["changed"][0]["created_at"]
+    assert changes["deleted"] == [ids[1]]
+
+    response = client.get("/tasks/changes?since=invalid", headers=headers)
+    assert response.status_code == 400
+
+    monkeypatch.setattr(sync, "TOMBSTONE_RETENTION_DAYS", 0)
+    response = client.get(f"/tasks/changes?since={sync_token}", headers=headers)
+    assert response.status_code == 410
+
+
+def test_task_changes_wait_for_open_transactions(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    # A long import: written before the sync, committed after it, with
+    # timestamps from when its transaction started
+    started_at = models.utcnow() - datetime.timedelta(minutes=5)
+    db.add(
+        models.Task(
+            title="Imported",
+            status="New",
+            user_id=user_id,
+            created_at=started_at,
+            updated_at=started_at,
+        )
+    )
+    db.flush()
+    changes = client.get("/tasks/changes", headers=headers).json()
+    assert changes["changed"] == []
+    db.commit()
+
+    url = f"/tasks/changes?since={changes['next_token']}"
+    changes = client.get(url, headers=headers).json()
+    assert [task["title"] for task in changes["changed"]] == ["Imported"]
+
+
+def test_task_stats(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    created = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Task {i}", "status": "New"} for i in range(4)],
+    ).json()
+    ids = [item["id"] for item in created]
+    client.patch(f"/tasks/{ids[0]}/complete/", headers=headers)
+    client.put(
+        f"/tasks/{ids[1]}/",
+        headers=headers,
+        json={"title": "Task 1", "status": "In Progress"},
+    )
+    client.delete(f"/tasks/{ids[2]}/", headers=headers)
+
+    expected = {"New": 1, "In Progress": 1, "Completed": 1}
+    response = client.get(f"/tasks/stats?user_id={user_id}", headers=headers)
+    assert response.json() == {"user_id": user_id, "counts": expected, "total": 3}
+    response = client.get("/tasks/stats", headers=headers)
+    assert response.json()["counts"] == expected
+    response = client.get(f"/tasks/stats?user_id={user_id + 1}", headers=headers)
+    assert response.json()["total"] == 0
+
+    db.execute(text("UPDATE task_stats SET count = 42"))
+    db.commit()
+
+    async def rebuild():
+        async with AsyncTestingSessionLocal() as session:
+            await crud.rebuild_task_stats(session)
+
+    asyncio.run(rebuild())
+    response = client.get(f"/tasks/stats?user_id={user_id}", headers=headers)
+    assert response.json()["counts"] == expected
+
+
+def test_search_tasks(client: TestClient, db: Session):
+    for username in ("testuser", "otheruser"):
+        client.post(
+            "/users/register/",
+            json={
+                "username": username,
+                "password": "password123",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+    headers = {}
+    for username in ("testuser", "otheruser"):
+        login_response = client.post(
+            "/users/login/",
+            json={"username": username, "password": "password123"},
+        )
+        token = login_response.json()["access_token"]
+        headers[username] = {"Authorization": f"Bearer {token}"}
+
+    created = client.post(
+        "/tasks/bulk",
+        headers=headers["testuser"],
+        json=[
+            {
+                "title": "Call the bank",
+                "description": "About deploying",
+                "status": "New",
+            },
+            {"title": "Deploy the release", "status": "New"},
+            {"title": "Water plants", "status": "New"},
+        ],
+    ).json()
+    ids = [item["id"] for item in created]
+    client.post(
+        "/tasks/",
+        headers=headers["otheruser"],
+        json={"title": "Deploy elsewhere", "status": "New"},
+    )
+
+    # Stemmed matches, with title matches ranked first
+    response = client.get("/tasks/search?q=deploy", headers=headers["testuser"])
+    assert response.status_code == 200
+    assert [task["id"] for task in response.json()] == [ids[1], ids[0]]
+    response = client.get(
+        "/tasks/search?q=deploy&limit=1&skip=1", headers=headers["testuser"]
+    )
+    assert [task["id"] for task in response.json()] == [ids[0]]
+
+    client.put(
+        f"/tasks/{ids[2]}/",
+        headers=headers["testuser"],
+        json={"title": "Deploy the plants", "status": "New"},
+    )
+    client.delete(f"/tasks/{ids[1]}/", headers=headers["testuser"])
+    response = client.get("/tasks/search?q=deploy", headers=headers["testuser"])
+    assert [task["id"] for task in response.json()] == [ids[2], ids[0]]
+
+    # The owner's id is indexed for scoping but is not searchable text
+    user_id = created[0]["task"]["user_id"]
+    response = client.get(f"/tasks/search?q={user_id}", headers=headers["testuser"])
+    assert response.json() == []
+    response = client.get('/tasks/search?q="*', headers=headers["testuser"])
+    assert response.json() == []
+    response = client.get("/tasks/search?q=", headers=headers["testuser"])
+    assert response.status_code == 422
+
+
+def test_list_responses_match_validated_serialization(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    titles = [
+        "Plain search task",
+        'Quotes " and \\ backslash search',
+        "Café ✓ 日本語 🚀 search",
+        "Control \u0001\u001f\u007f\t\n search",
+        "</script> \u2028 search",
+    ]
+    client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[
+            {"title": title, "description": title[::-1], "status": "New"}
+            for title in titles
+        ]
+        + [{"title": "No description search", "status": "New"}],
+    )
+    user_id = client.get("/users/", headers=headers).json()[0]["id"]
+
+    # What FastAPI renders after validating ORM objects against the schema
+    def expected(tasks):
+        validated = parse_obj_as(List[schemas.TaskResponse], tasks)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    tasks = db.scalars(select(models.Task).order_by(models.Task.id)).all()
+    for url in (
+        "/tasks/?limit=100",
+        "/tasks/status/New/?limit=100",
+        f"/tasks/user/{user_id}/?limit=100",
+    ):
+        response = client.get(url, headers=headers)
+        assert response.content == expected(tasks)
+
+    response = client.get("/tasks/search?q=search&limit=100", headers=headers)
+    by_id = {task.id: task for task in tasks}
+    assert response.content == expected([by_id[item["id"]] for item in response.json()])
+    assert len(response.json()) == len(tasks)
+
+
+def test_sparse_fieldsets(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[
+            {"title": f"Task {i}", "description": "x" * 500, "status": "New"}
+            for i in range(3)
+        ],
+    ).json()
+    ids = [item["id"] for item in created]
+    user_id = created[0]["task"]["user_id"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM tasks" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/tasks/?fields=title,status", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    # Requested fields in schema order, plus the id
+    assert [list(task) for task in response.json()] == [["title", "status", "id"]] * 3
+    assert len(statements) == 1
+    assert "description" not in statements[0]
+
+    response = client.get(f"/tasks/{ids[0]}/?fields=title", headers=headers)
+    assert response.json() == {"title": "Task 0", "id": ids[0]}
+    response = client.get(f"/tasks/{ids[0]}/", headers=headers)
+    assert response.json()["description"] == "x" * 500
+
+    # Cursor pagination still works without the id among the fields
+    response = client.get(
+        f"/tasks/user/{user_id}/?fields=status&limit=2", headers=headers
+    )
+    assert response.json() == [
+        {"status": "New", "id": ids[0]},
+        {"status": "New", "id": ids[1]},
+    ]
+    response = client.get(response.links["next"]["url"], headers=headers)
+    assert response.json() == [{"status": "New", "id": ids[2]}]
+
+    response = client.get("/tasks/status/New/?fields=", headers=headers)
+    assert response.json() == [{"id": task_id} for task_id in ids]
+    response = client.get("/tasks/search?q=task&fields=title", headers=headers)
+    assert {task["title"] for task in response.json()} == {"Task 0", "Task 1", "Task 2"}
+
+    response = client.get("/tasks/?fields=title,password", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: password"
+
+
+def test_read_tasks_batch(client: TestClient, db: Session):
+    client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "testuser", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    created = client.post(
+        "/tasks/bulk",
+        headers=headers,
+        json=[{"title": f"Task {i}", "status": "New"} for i in range(3)],
+    ).json()
+    ids = [item["id"] for item in created]
+    missing_id = ids[-1] + 100
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM tasks" in statement:
+            statements.append(statement)
+
+    requested = [ids[2], missing_id, ids[0], ids[2]]
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.get(
+            f"/tasks/batch?ids={','.join(map(str, requested))}", headers=headers
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    body = response.json()
+    assert [task["id"] for task in body["items"]] == [ids[2], ids[0]]
+    assert body["items"][0] == client.get(f"/tasks/{ids[2]}/", headers=headers).json()
+    assert body["missing"] == [missing_id]
+    assert len(statements) == 1
+
+    response = client.get(f"/tasks/batch?ids={ids[1]}&fields=title", headers=headers)
+    assert response.json() == {
+        "items": [{"title": "Task 1", "id": ids[1]}],
+        "missing": [],
+    }
+
+    response = client.get("/tasks/batch?ids=1,x", headers=headers)
+    assert response.status_code == 400
+    response = client.get(
+        f"/tasks/batch?ids={','.join(map(str, range(501)))}", headers=headers
+    )
+    assert response.status_code == 413
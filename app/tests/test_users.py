@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app import security
+
 
 def test_register_user(client: TestClient, db: Session):
     response = client.post(
@@ -100,3 +102,50 @@ def test_login_user_with_wrong_password(client: TestClient, db: Session):
         json={"username": "testuser", "password": "wrongpassword"},
     )
     assert response.status_code == 400
+
+
+def test_register_user_when_password_hasher_is_saturated(
+    client: TestClient, db: Session, monkeypatch
+):
+    monkeypatch.setattr(security.password_hasher, "max_pending", 0)
+    response = client.post(
+        "/users/register/",
+        json={
+            "username": "testuser",
+            "password": "password123",
+            "first_name": "Test",
+            "last_name": "User",
+        },
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(security.password_hasher.retry_after)
+    assert security.password_hasher.stats()["rejected"] >= 1
+
+
+def test_read_users_batch(client: TestClient, db: Session):
+    for username in ("user1", "user2"):
+        client.post(
+            "/users/register/",
+            json={
+                "username": username,
+                "password": "password123",
+                "first_name": "Test",
+                "last_name": "User",
+            },
+        )
+    login_response = client.post(
+        "/users/login/",
+        json={"username": "user1", "password": "password123"},
+    )
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    users = client.get("/users/", headers=headers).json()
+
+    ids = f"{users[1]['id']},999,{users[0]['id']}"
+    response = client.get(f"/users/batch?ids={ids}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"items": [users[1], users[0]], "missing": [999]}
+    assert "password" not in response.json()["items"][0]
+
+    response = client.get(f"/users/batch?ids={ids}")
+    assert response.status_code == 401
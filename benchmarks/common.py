@@ -0,0 +1,113 @@
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LATENCY_METRICS = ("p50_ms", "p99_ms")
+THROUGHPUT_METRICS = ("ops_per_sec",)
+
+RATE_LIMIT_SETTINGS = (
+    "USERS_RATE_LIMIT_PER_IP",
+    "LOGIN_RATE_LIMIT_PER_USERNAME",
+    "TASKS_RATE_LIMIT_PER_PRINCIPAL",
+)
+
+
+# Point the app at `database_url` and bring its schema up to date. Must run
+# before anything under `app` is imported, since settings are read at import.
+def configure_database(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    # All requests come from one in-process client and a few users, which the
+    # rate limits would reject; set these explicitly to benchmark with them
+    for name in RATE_LIMIT_SETTINGS:
+        os.environ.setdefault(name, "")
+    subprocess.run(
+        [sys.executable, "-m", "app.cli", "migrate"],
+        cwd=ROOT,
+        env=os.environ,
+        check=True,
+        capture_output=True,
+    )
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+# Summarize per-operation latencies (seconds) measured over `elapsed` seconds
+def summarize(latencies, elapsed: float) -> dict:
+    if not latencies:
+        return dict.fromkeys(("count", "mean_ms", "p50_ms", "p99_ms", "ops_per_sec"), 0)
+    return {
+        "count": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "ops_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+# Time `iterations` awaited calls of `func` after `warmup` untimed ones
+async def bench(func, iterations: int, warmup: int = 5) -> dict:
+    for _ in range(warmup):
+        await func()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+# Metrics that got worse than the baseline by more than `max_regression`
+# (a fraction, e.g. 0.1 for 10%)
+def find_regressions(results: dict, baseline: dict, max_regression: float):
+    regressions = []
+    for name, metrics in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if metrics[metric] > reference[metric] * (1 + max_regression):
+                regressions.append(
+                    f"{name}.{metric}: {metrics[metric]:.2f} vs {reference[metric]:.2f}"
+                )
+        for metric in THROUGHPUT_METRICS:
+            if metrics[metric] < reference[metric] * (1 - max_regression):
+                regressions.append(
+                    f"{name}.{metric}: {metrics[metric]:.1f} vs {reference[metric]:.1f}"
+                )
+    return regressions
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--save-baseline", help="Write the results as a JSON baseline")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="Allowed slowdown against the baseline, as a fraction (default 0.10)",
+    )
+
+
+# Print results, save/compare baselines and exit non-zero on regressions
+def report(results: dict, args):
+    print(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = find_regressions(results, baseline, args.max_regression)
+        if regressions:
+            sys.exit("Regressions against baseline:\n  " + "\n  ".join(regressions))
@@ -0,0 +1,122 @@
+# Response compression: CPU time spent compressing typical task responses with
+# each encoding and level, against the bytes saved and the transfer time that
+# saves on a slow link. Uses the compressors of app.compression directly.
+#
+#   python -m benchmarks.compression --link-mbps 2 --save-baseline compression.json
+import argparse
+import datetime
+import random
+import time
+
+from benchmarks.common import add_baseline_arguments, report, summarize
+from benchmarks.seed import WORDS
+
+# (encoding, level) pairs tried when the encoding's module is installed
+LEVELS = [
+    ("gzip", 1),
+    ("gzip", 6),
+    ("gzip", 9),
+    ("br", 1),
+    ("br", 4),
+    ("br", 9),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+]
+
+
+def _tasks(count: int, rng: random.Random) -> list:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            "title": " ".join(rng.choices(WORDS, k=3)).capitalize(),
+            "description": " ".join(rng.choices(WORDS, k=20)),
+            "status": rng.choice(["New", "In Progress", "Completed"]),
+            "id": index + 1,
+            "user_id": 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+
+# Bodies as the app sends them: a list of chunks, one for a complete response
+def _bodies() -> dict:
+    from app import serialization
+
+    rng = random.Random(0)
+    export = _tasks(10000, rng)
+    return {
+        "list_10": [serialization.dumps(_tasks(10, rng))],
+        "list_100": [serialization.dumps(_tasks(100, rng))],
+        "export_10000": [
+            b"".join(serialization.dumps(task) + b"\n" for task in export[i : i + 1000])
+            for i in range(0, len(export), 1000)
+        ],
+    }
+
+
+def _compress(factory, chunks) -> bytes:
+    compressor = factory()
+    parts = [compressor.compress(chunk) for chunk in chunks[:-1]]
+    parts.append(compressor.finish(chunks[-1]))
+    return b"".join(parts)
+
+
+def run(iterations: int, link_mbps: float) -> dict:
+    from app import compression
+
+    factories = {
+        "gzip": compression.GzipCompressor,
+        "br": compression.BrotliCompressor if compression.brotli else None,
+        "zstd": compression.ZstdCompressor if compression.zstandard else None,
+    }
+    bytes_per_ms = link_mbps * 1_000_000 / 8 / 1000
+
+    results = {}
+    for body_name, chunks in _bodies().items():
+        size = sum(len(chunk) for chunk in chunks)
+        for encoding, level in LEVELS:
+            compressor_class = factories[encoding]
+            if compressor_class is None:
+                continue
+
+            def factory(compressor_class=compressor_class, level=level):
+                return compressor_class(level)
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                call_started = time.process_time()
+                compressed = _compress(factory, chunks)
+                latencies.append(time.process_time() - call_started)
+            result = summarize(latencies, time.perf_counter() - started)
+            result.update(
+                bytes=size,
+                compressed_bytes=len(compressed),
+                ratio=size / len(compressed),
+                # Transfer time saved on the link, net of the CPU spent
+                net_saving_ms=(size - len(compressed)) / bytes_per_ms
+                - result["p50_ms"],
+            )
+            results[f"{body_name}_{encoding}_{level}"] = result
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compression")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--link-mbps",
+        type=float,
+        default=2.0,
+        help="Client link speed used for net_saving_ms (default 2 Mbit/s)",
+    )
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+    report(run(args.iterations, args.link_mbps), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# In-process load driver: concurrent requests against the ASGI app through
+# httpx, reporting p50/p99 latency and requests/sec per scenario.
+#
+#   python -m benchmarks.load --concurrency 50 --requests 2000 --save-baseline load.json
+#   python -m benchmarks.load --concurrency 50 --requests 2000 --baseline load.json
+import argparse
+import asyncio
+import itertools
+import random
+import tempfile
+import time
+
+from benchmarks.common import (
+    add_baseline_arguments,
+    configure_database,
+    report,
+    summarize,
+)
+
+SCENARIOS = (
+    "list_tasks",
+    "list_user_tasks",
+    "filter_tasks_by_status",
+    "read_task",
+    "create_task",
+    "login",
+)
+
+
+# Build a function that sends one request of `scenario` for a random user
+def _request_factory(scenario: str, users: int, tasks: int, tokens: list):
+    from benchmarks.seed import PASSWORD, username_for
+
+    rng = random.Random(0)
+
+    def request(client):
+        index = rng.randrange(users)
+        headers = {"Authorization": f"Bearer {tokens[index]}"}
+        if scenario == "list_tasks":
+            return client.get("/tasks/?limit=50", headers=headers)
+        if scenario == "list_user_tasks":
+            return client.get(f"/tasks/user/{index + 1}/?limit=50", headers=headers)
+        if scenario == "filter_tasks_by_status":
+            return client.get("/tasks/status/New/?limit=50", headers=headers)
+        if scenario == "read_task":
+            task_id = rng.randrange(1, users * tasks + 1)
+            return client.get(f"/tasks/{task_id}/", headers=headers)
+        if scenario == "create_task":
+            return client.post(
+                "/tasks/", headers=headers, json={"title": "Load", "status": "New"}
+            )
+        return client.post(
+            "/users/login/",
+            json={"username": username_for(index), "password": PASSWORD},
+        )
+
+    return request
+
+
+async def _drive(app, request, total: int, concurrency: int) -> dict:
+    import httpx
+
+    counter = itertools.count()
+    latencies, errors, rate_limited = [], 0, 0
+
+    async def worker(client):
+        nonlocal errors, rate_limited
+        while next(counter) < total:
+            started = time.perf_counter()
+            response = await request(client)
+            # Rejections return before any real work, so they would skew
+            # the latencies
+            if response.status_code == 429:
+                rate_limited += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        **summarize(latencies, elapsed),
+        "errors": errors,
+        "rate_limited": rate_limited,
+    }
+
+
+async def run(scenarios, users: int, tasks: int, total: int, concurrency: int) -> dict:
+    from app import security
+    from app.database import dispose_engine
+    from app.main import app
+    from benchmarks.seed import username_for
+
+    tokens = [
+        security.create_access_token(data={"sub": username_for(index)})
+        for index in range(users)
+    ]
+    results = {}
+    try:
+        for scenario in scenarios:
+            request = _request_factory(scenario, users, tasks, tokens)
+            # Login is bound by bcrypt, so use a proportionally smaller sample
+            count = max(total // 50, concurrency) if scenario == "login" else total
+            results[scenario] = await _drive(app, request, count, concurrency)
+    finally:
+        security.password_hasher.shutdown()
+        await dispose_engine()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument(
+        "--database-url", help="Existing database to use (default: temporary SQLite)"
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--scenario", action="append", choices=SCENARIOS, dest="scenarios"
+    )
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/load.db"
+        configure_database(database_url)
+
+        if args.database_url is None:
+            from benchmarks.seed import seed
+
+            seed(database_url, args.users, args.tasks)
+        results = asyncio.run(
+            run(
+                args.scenarios or SCENARIOS,
+                args.users,
+                args.tasks,
+                args.requests,
+                args.concurrency,
+            )
+        )
+    report(results, args)
+
+
+if __name__ == "__main__":
+    main()
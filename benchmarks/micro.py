@@ -0,0 +1,104 @@
+# Micro-benchmarks for the API hot paths, called in-process without HTTP.
+#
+#   python -m benchmarks.micro --users 50 --tasks 200 --save-baseline micro.json
+#   python -m benchmarks.micro --users 50 --tasks 200 --baseline micro.json
+import argparse
+import asyncio
+import tempfile
+
+from benchmarks.common import (
+    add_baseline_arguments,
+    bench,
+    configure_database,
+    report,
+)
+
+
+async def run(iterations: int, login_iterations: int) -> dict:
+    from app import crud, dependencies, schemas, security
+    from app.cache import principal_cache
+    from app.database import SessionLocal, dispose_engine, get_engine
+    from app.routers import users
+    from benchmarks.seed import PASSWORD, username_for
+
+    username = username_for(0)
+    token = security.create_access_token(data={"sub": username})
+    task = schemas.TaskCreate(title="Benchmark task", status=schemas.TaskStatus.new)
+    login = schemas.UserLogin(username=username, password=PASSWORD)
+
+    results = {}
+    try:
+        async with SessionLocal(bind=get_engine()) as db:
+            user = await crud.get_user_by_username(db, username=username)
+            newest_id = (await crud.get_tasks(db, skip=0, limit=1))[0].id
+
+            async def current_user_uncached():
+                await principal_cache.backend.clear()
+                await dependencies.get_current_user(token=token, db=db)
+
+            async def current_user_cached():
+                await dependencies.get_current_user(token=token, db=db)
+
+            async def create_task():
+                await crud.create_task(db, task=task, user_id=user.id)
+
+            async def list_tasks_offset_deep():
+                await crud.get_tasks(db, skip=newest_id // 2, limit=50)
+
+            async def list_tasks_cursor_deep():
+                await crud.get_tasks(db, limit=50, after_id=newest_id // 2)
+
+            async def list_user_tasks():
+                await crud.get_user_tasks(db, user_id=user.id, limit=50)
+
+            async def filter_tasks_by_status():
+                await crud.filter_tasks_by_status(
+                    db, status=schemas.TaskStatus.in_progress, limit=50
+                )
+
+            async def login_user():
+                await users.login_user(login, db=db)
+
+            for name, func in (
+                ("get_current_user_uncached", current_user_uncached),
+                ("get_current_user_cached", current_user_cached),
+                ("create_task", create_task),
+                ("list_tasks_offset_deep", list_tasks_offset_deep),
+                ("list_tasks_cursor_deep", list_tasks_cursor_deep),
+                ("list_user_tasks", list_user_tasks),
+                ("filter_tasks_by_status", filter_tasks_by_status),
+            ):
+                results[name] = await bench(func, iterations)
+            results["login"] = await bench(login_user, login_iterations, warmup=1)
+    finally:
+        security.password_hasher.shutdown()
+        await dispose_engine()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro")
+    parser.add_argument(
+        "--database-url", help="Existing database to use (default: temporary SQLite)"
+    )
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--login-iterations", type=int, default=20)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/micro.db"
+        configure_database(database_url)
+
+        if args.database_url is None:
+            from benchmarks.seed import seed
+
+            seed(database_url, args.users, args.tasks)
+        results = asyncio.run(run(args.iterations, args.login_iterations))
+    report(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Full-text search latency: GET /tasks/search queries run in-process against a
+# seeded database, next to the LIKE scan they replace.
+#
+#   python -m benchmarks.search --users 1000 --tasks 1000 --save-baseline search.json
+#   python -m benchmarks.search --database-url postgresql://... --users 1000
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from benchmarks.common import (
+    add_baseline_arguments,
+    configure_database,
+    report,
+    summarize,
+)
+
+QUERIES = {
+    "one_word": "deploy",
+    "two_words": "review release",
+    "stemmed": "deploying",
+    "no_match": "nonexistent",
+}
+
+
+async def _bench(func, users: int, iterations: int) -> dict:
+    rng = random.Random(0)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        user_id = rng.randrange(1, users + 1)
+        call_started = time.perf_counter()
+        await func(user_id)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run(users: int, iterations: int, limit: int) -> dict:
+    from sqlalchemy import or_, select
+
+    from app import crud, models
+    from app.database import SessionLocal, dispose_engine, get_engine
+
+    results = {}
+    try:
+        async with SessionLocal(bind=get_engine()) as db:
+            for name, query in QUERIES.items():
+
+                async def search(user_id, query=query):
+                    await crud.search_tasks(
+                        db, user_id=user_id, query=query, limit=limit
+                    )
+
+                results[f"search_{name}"] = await _bench(search, users, iterations)
+
+            # Unranked substring match over the user's tasks, for comparison
+            async def like_scan(user_id):
+                pattern = f"%{QUERIES['one_word']}%"
+                stmt = (
+                    select(models.Task)
+                    .where(
+                        models.Task.user_id == user_id,
+                        or_(
+                            models.Task.title.ilike(pattern),
+                            models.Task.description.ilike(pattern),
+                        ),
+                    )
+                    .limit(limit)
+                )
+                (await db.scalars(stmt)).all()
+
+            results["like_scan_one_word"] = await _bench(like_scan, users, iterations)
+    finally:
+        await dispose_engine()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.search")
+    parser.add_argument(
+        "--database-url", help="Existing database to use (default: temporary SQLite)"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=1000, help="Tasks per user")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/search.db"
+        configure_database(database_url)
+
+        if args.database_url is None:
+            from benchmarks.seed import seed
+
+            started = time.perf_counter()
+            count = seed(database_url, args.users, args.tasks)
+            print(f"Seeded {count} tasks in {time.perf_counter() - started:.1f}s")
+        results = asyncio.run(run(args.users, args.iterations, args.limit))
+    report(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Seeded data generator: N users x M tasks, inserted in bulk.
+#
+#   python -m benchmarks.seed --database-url sqlite:///./bench.db --users 100 --tasks 1000
+import argparse
+import random
+
+from sqlalchemy import create_engine, insert
+
+from app import models
+from app.database import sync_database_url
+from app.security import get_password_hash
+
+PASSWORD = "password123"
+
+WORDS = (
+    "write review plan ship fix deploy draft call email update refactor test "
+    "design migrate document benchmark profile release triage sync"
+).split()
+
+
+def username_for(index: int) -> str:
+    return f"user{index}"
+
+
+# Insert `users` users with `tasks_per_user` tasks each; every user's password
+# is PASSWORD. Returns the number of tasks written.
+def seed(
+    database_url: str,
+    users: int,
+    tasks_per_user: int,
+    seed_value: int = 0,
+    batch_size: int = 10000,
+) -> int:
+    rng = random.Random(seed_value)
+    statuses = list(models.TaskStatusEnum)
+    password = get_password_hash(PASSWORD)
+
+    engine = create_engine(sync_database_url(database_url))
+    with engine.begin() as conn:
+        user_ids = conn.scalars(
+            insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "username": username_for(index),
+                    "first_name": f"User {index}",
+                    "last_name": "Benchmark",
+                    "password": password,
+                }
+                for index in range(users)
+            ],
+        ).all()
+
+        batch = []
+        for user_id in user_ids:
+            for _ in range(tasks_per_user):
+                batch.append(
+                    {
+                        "title": " ".join(rng.choices(WORDS, k=3)).capitalize(),
+                        "description": " ".join(rng.choices(WORDS, k=20)),
+                        "status": rng.choice(statuses),
+                        "user_id": user_id,
+                    }
+                )
+                if len(batch) >= batch_size:
+                    conn.execute(insert(models.Task), batch)
+                    batch = []
+        if batch:
+            conn.execute(insert(models.Task), batch)
+    engine.dispose()
+    return users * tasks_per_user
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks", type=int, default=100, help="Tasks per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    count = seed(args.database_url, args.users, args.tasks, args.seed)
+    print(f"Seeded {args.users} users and {count} tasks")
+
+
+if __name__ == "__main__":
+    main()
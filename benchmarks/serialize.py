@@ -0,0 +1,86 @@
+# List response serialization: a page of tasks loaded as ORM objects and
+# validated against List[TaskResponse] by FastAPI, next to the column-only
+# select rendered by serialization.rows_response. Both include the query.
+#
+#   python -m benchmarks.serialize --save-baseline serialize.json
+import argparse
+import asyncio
+import tempfile
+
+from benchmarks.common import (
+    add_baseline_arguments,
+    bench,
+    configure_database,
+    report,
+)
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+async def run(iterations: int) -> dict:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from sqlalchemy import select
+
+    from app import crud, models, serialization
+    from app.database import SessionLocal, dispose_engine, get_engine
+    from app.routers import tasks as tasks_router
+
+    route = next(
+        route for route in tasks_router.router.routes if route.name == "read_tasks"
+    )
+
+    results = {}
+    try:
+        async with SessionLocal(bind=get_engine()) as db:
+            for page_size in PAGE_SIZES:
+
+                # What read_tasks did before: FastAPI validates every ORM
+                # object, then runs jsonable_encoder and json.dumps
+                async def validated(page_size=page_size):
+                    stmt = select(models.Task).order_by(models.Task.id)
+                    tasks = (await db.scalars(stmt.limit(page_size))).all()
+                    content = await serialize_response(
+                        field=route.secure_cloned_response_field,
+                        response_content=tasks,
+                        is_coroutine=True,
+                    )
+                    return JSONResponse(content).body
+
+                async def fast(page_size=page_size):
+                    tasks = await crud.get_tasks(db, limit=page_size)
+                    return serialization.rows_response(tasks).body
+
+                results[f"validated_{page_size}"] = await bench(validated, iterations)
+                results[f"fast_{page_size}"] = await bench(fast, iterations)
+                db.expunge_all()
+    finally:
+        await dispose_engine()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialize")
+    parser.add_argument(
+        "--database-url", help="Existing database to use (default: temporary SQLite)"
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user")
+    parser.add_argument("--iterations", type=int, default=200)
+    add_baseline_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{tmp}/serialize.db"
+        configure_database(database_url)
+
+        if args.database_url is None:
+            from benchmarks.seed import seed
+
+            seed(database_url, args.users, args.tasks)
+        results = asyncio.run(run(args.iterations))
+    report(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Cold start benchmark: time to import app.main plus the first request that
+# touches the database, measured in fresh interpreter processes.
+#
+#   python -m benchmarks.startup --runs 10 --max-total-ms 1500
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# Runs inside the child process and prints one JSON measurement
+def _measure_child():
+    started = time.perf_counter()
+    import httpx
+
+    from app.database import dispose_engine
+    from app.main import app
+
+    imported = time.perf_counter()
+
+    async def first_request():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                response = await client.post(
+                    "/users/login/",
+                    json={"username": "nobody", "password": "password123"},
+                )
+                assert response.status_code == 400, response.text
+        finally:
+            # A connection left open keeps its aiosqlite thread, and the
+            # process, alive
+            await dispose_engine()
+
+    asyncio.run(first_request())
+    finished = time.perf_counter()
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - started) * 1000,
+                "first_request_ms": (finished - imported) * 1000,
+                "total_ms": (finished - started) * 1000,
+            }
+        )
+    )
+
+
+def _summary(samples):
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument(
+        "--max-total-ms",
+        type=float,
+        help="Exit non-zero when the median cold start exceeds this",
+    )
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _measure_child()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{tmp}/startup.db",
+            "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+        }
+        subprocess.run(
+            [sys.executable, "-m", "app.cli", "migrate"],
+            cwd=ROOT,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+        runs = [
+            json.loads(
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.startup", "--child"],
+                    cwd=ROOT,
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+            )
+            for _ in range(args.runs)
+        ]
+
+    results = {
+        metric: _summary([run[metric] for run in runs])
+        for metric in ("import_ms", "first_request_ms", "total_ms")
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    if (
+        args.max_total_ms is not None
+        and results["total_ms"]["median"] > args.max_total_ms
+    ):
+        sys.exit(
+            f"Median cold start {results['total_ms']['median']:.1f} ms exceeds "
+            f"{args.max_total_ms:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()